@@ -7,7 +7,7 @@ def main():
     # This library allows you to generate random numbers.
 
     import numpy as np
-    from datetime import datetime
+    from datetime import datetime, timedelta
     import debug_common
 
 
@@ -18,6 +18,9 @@ def main():
     # Import the Halite SDK, which will let you interact with the game.
     import hlt
     from hlt.enemy_monitor import EnemyMonitor
+    from hlt.planning import COLLECTING_SEARCH_SECONDS, ENEMY_PREDICTION_SECONDS, MINING_SEARCH_SPACE, TurnScheduler, best_collecting_moves
+    from hlt.parallel import SEARCH_WORKERS
+    from hlt.resolver import MoveResolver
     # This library contains  constant values.
     from hlt import constants
     turn_timer = {}
@@ -30,6 +33,12 @@ def main():
     coordinator = hlt.entity.Coordinator(game)
     coordinator.generate_game_plan(game, logging)
     enemy_monitor = EnemyMonitor(game)
+    # The search workers have to be forked before the game starts
+    search_pool = None
+    if SEARCH_WORKERS > 0:
+        # The pool needs Python 3.8 for its shared memory
+        from hlt.parallel import SearchPool
+        search_pool = SearchPool(game, SEARCH_WORKERS)
 
     game.ready("csmyu_v25")
 
@@ -45,7 +54,11 @@ def main():
         for zone in coordinator.zones.values():
             zone.refresh_values(game)
         game.update_dictionaries(coordinator, logging)
-        enemy_monitor.new_round(game)
+        enemy_monitor.new_round(game, None if debug_common.debug_mode else turn_start_time + timedelta(seconds=ENEMY_PREDICTION_SECONDS))
+        # Returning ships read their moves off the return cost field, once the enemies' intentions are marked
+        game.game_map.update_return_costs(game.me)
+        # Bounds the mining searches, once the enemies to take down are known
+        game.game_map.update_extractable_reach(game.me, MINING_SEARCH_SPACE)
 
         # You extract player metadata and the updated map metadata here for convenience.
         me = game.me
@@ -75,36 +88,20 @@ def main():
         coordinator.generate_game_plan(game, logging)
         coordinator.check_send_ship_to_create_dropoff(game)
 
+        collecting_deadline = None if debug_common.debug_mode else turn_start_time + timedelta(seconds=COLLECTING_SEARCH_SECONDS)
+        game.collecting_moves = best_collecting_moves(game, game_map, [ship for ship in me.get_ships() if ship.mission == 'collect_from_zone'], MINING_SEARCH_SPACE, logging, collecting_deadline)
+
         for ship in me.get_ships():
-            if not debug_common.debug_mode \
-                    and (datetime.now() - turn_start_time).total_seconds() > 1.6:
-                break
             if ship.id not in game.turn_ship_created.keys():
                 game.turn_ship_created[ship.id] = game.turn_number
-            logging.info('getting best intention for ship: {}, mission: {}'.format(ship.id, ship.mission))
-            ship.get_best_intention(game, game_map, logging, coordinator, command_queue, turn_start_time)
-
-        for attempt_no in range(1,7):
-            if not debug_common.debug_mode \
-                    and (datetime.now() - turn_start_time).total_seconds() > 1.8:
-                break
-            if attempt_no == 1:
-                game_map.resolve_swaps(me, command_queue)
-            if attempt_no == 5:
-                game_map.resolve_swaps(me, command_queue, second_choice=True)
-            for ship in [ship for ship in me.get_ships() if not ship.command_sent]:
-                single_instruction = ship.resolve_intention(game, game_map, attempt_no)
-                if single_instruction is not None:
-                    command_queue.append(single_instruction)
+        scheduler = TurnScheduler(turn_start_time, use_deadlines=not debug_common.debug_mode)
+        scheduler.plan_ships(game, game_map, logging, coordinator, command_queue, me.get_ships(), search_pool)
 
-        coordinator.check_generate_new_ship(game, command_queue)
+        MoveResolver(game, game_map).resolve(me.get_ships(), command_queue)
 
-        game.game_missions = {ship.id : ship.mission for ship in me.get_ships()}
-        game.still_counts = {ship.id : ship.still_count for ship in me.get_ships()}
-        game.last_positions = {ship.id : ship.position for ship in me.get_ships()}
+        coordinator.check_generate_new_ship(game, command_queue)
 
         # game.dict_positions = game_map.get_marked_position(me)
-        coordinator.assigned_target_squares = {ship.id : ship.target_square for ship in me.get_ships() if ship.target_square is not None}
 
         logging.info('total_halite: {}, min_halite_to_take: {}, total_halite: {}, ship_count: {}'.format(game.game_map.get_total_halite(), game.min_halite_to_take, game.me.halite_amount, len(game.me.get_ships())))
         if game.turn_number == constants.MAX_TURNS:
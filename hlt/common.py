@@ -1,3 +1,8 @@
+import logging
+import sys
+
+import numpy as np
+
 # Placed here to avoid circular imports
 import debug_common
 
@@ -18,4 +23,64 @@ def read_input():
 def __get_line():
     next_line = debug_common.input_arr[0]
     debug_common.input_arr = debug_common.input_arr[1:]
-    return next_line
\ No newline at end of file
+    return next_line
+
+def read_frame(num_players):
+    """
+    Reads a whole turn frame from stdin in one go and parses it into integer arrays,
+    shutting down logging and exiting if the engine closes the pipe.
+    :param num_players: The number of players in the game
+    :return: A tuple of (turn_number, players, ships, dropoffs, cells) where
+        players is an array of [player_id, num_ships, num_dropoffs, halite] rows,
+        ships is an array of [owner, ship_id, x, y, halite] rows,
+        dropoffs is an array of [owner, dropoff_id, x, y] rows and
+        cells is an array of [x, y, halite] rows for the cells that changed.
+    """
+    data = b''
+    while True:
+        if debug_common.debug_mode == True:
+            data += __get_line().encode() + b'\n'
+        else:
+            chunk = sys.stdin.buffer.read1(1 << 16)
+            if not chunk:
+                logging.shutdown()
+                raise SystemExit('EOF while reading frame')
+            data += chunk
+        # A frame is only complete once its last line has been terminated
+        if data.endswith(b'\n'):
+            tokens = np.fromstring(data, dtype=np.int64, sep=' ')
+            frame = _parse_frame(tokens, num_players)
+            if frame is not None:
+                return frame
+
+def _parse_frame(tokens, num_players):
+    """
+    Splits the flat token array of a frame into its sections.
+    :return: The parsed frame, or None if the tokens do not yet hold a whole frame
+    """
+    players = np.empty((num_players, 4), dtype=np.int64)
+    ship_blocks = []
+    dropoff_blocks = []
+    index = 1
+    for player_no in range(num_players):
+        if index + 4 > len(tokens):
+            return None
+        players[player_no] = tokens[index:index + 4]
+        player_id, num_ships, num_dropoffs = int(tokens[index]), int(tokens[index + 1]), int(tokens[index + 2])
+        index += 4
+        if index + 4 * num_ships + 3 * num_dropoffs > len(tokens):
+            return None
+        ships = tokens[index:index + 4 * num_ships].reshape(num_ships, 4)
+        ship_blocks.append(np.column_stack((np.full(num_ships, player_id, dtype=np.int64), ships)))
+        index += 4 * num_ships
+        dropoffs = tokens[index:index + 3 * num_dropoffs].reshape(num_dropoffs, 3)
+        dropoff_blocks.append(np.column_stack((np.full(num_dropoffs, player_id, dtype=np.int64), dropoffs)))
+        index += 3 * num_dropoffs
+    if index + 1 > len(tokens):
+        return None
+    num_cells = int(tokens[index])
+    index += 1
+    if index + 3 * num_cells > len(tokens):
+        return None
+    cells = tokens[index:index + 3 * num_cells].reshape(num_cells, 3)
+    return int(tokens[0]), players, np.concatenate(ship_blocks), np.concatenate(dropoff_blocks), cells
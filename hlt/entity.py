@@ -2,11 +2,10 @@ import abc
 
 from . import commands, constants
 from .positionals import Direction, Position
-from .common import read_input
 from .pathfinder import Graph
+from .planning import BASE_SEARCH_SPACE, DeadlineClock, SearchTimeout
 from .test_pathfinder import find_path, create_grid_and_find_path
 import logging
-from datetime import datetime
 import debug_common
 import numpy as np
 import itertools
@@ -22,15 +21,14 @@ class Entity(abc.ABC):
         self.position = position
         self.surrounding_value = -1
 
-    @staticmethod
-    def _generate(player_id):
+    @classmethod
+    def _generate(cls, player_id, entity_id, x_position, y_position):
         """
-        Method which creates an entity for a specific player given input from the engine.
+        Method which creates an entity for a specific player given a row of the engine's frame.
         :param player_id: The player id for the player who owns this entity
-        :return: An instance of Entity along with its id
+        :return: An instance of the entity along with its id
         """
-        ship_id, x_position, y_position = map(int, read_input().split())
-        return ship_id, Entity(player_id, ship_id, Position(x_position, y_position))
+        return entity_id, cls(player_id, entity_id, Position(x_position, y_position))
 
     def __repr__(self):
         return "{}(id={}, {})".format(self.__class__.__name__,
@@ -92,6 +90,7 @@ class Ship(Entity):
         self.action = None
         self.target_square = None
         self.best_intention = None
+        self.target_for_search = None
         self.command_sent = False
         # self.had_to_wait = False
         self.enemy_takedown_ship_passive = False
@@ -127,15 +126,34 @@ class Ship(Entity):
         return "{} {} {}".format(commands.MOVE, self.id, commands.STAY_STILL)
 
     @staticmethod
-    def _generate(player_id):
+    def _generate(player_id, ship_id, x_position, y_position, halite):
         """
-        Creates an instance of a ship for a given player given the engine's input.
+        Creates an instance of a ship for a given player given a row of the engine's frame.
         :param player_id: The id of the player who owns this ship
         :return: The ship id and ship object
         """
-        ship_id, x_position, y_position, halite = map(int, read_input().split())
         return ship_id, Ship(player_id, ship_id, Position(x_position, y_position), halite)
 
+    def _update(self, x_position, y_position, halite):
+        """
+        Updates this ship in place from a row of the engine's frame. Mission, target zone, target square
+        and still count survive across turns, everything decided during a turn is cleared.
+        :return: nothing.
+        """
+        position = Position(x_position, y_position)
+        self.still_count = self.still_count + 1 if position == self.position else 0
+        self.position = position
+        self.halite_amount = halite
+        self.action = None
+        self.best_intention = None
+        self.target_for_search = None
+        self.command_sent = False
+        self.enemy_takedown_ship_passive = False
+        self.enemy_takedown_ship = False
+        self.enemy_inspired = False
+        self.enemy_expected_value_if_still = 0
+        self.enemy_still_to_gain = 0
+
     def __repr__(self):
         return "{}(id={}, {}, cargo={} halite, mission={})".format(self.__class__.__name__,
                                                        self.id,
@@ -176,11 +194,7 @@ class Ship(Entity):
                 else:
                     return self.coordinator_target_zone.center
         elif self.mission == 'final_base_return' or self.mission == 'go_to_base':
-            closest_base = game.me.shipyard
-            for dropoff in game.me.get_dropoffs():
-                if game.game_map.calculate_distance(self.position, dropoff.position) < game.game_map.calculate_distance(self.position, closest_base.position):
-                    closest_base = dropoff
-            return closest_base.position
+            return game.game_map.closest_structure(self.position).position
 
     def get_adjusted_shipyard_position(self, game_map, shipyard, random):
         if shipyard.traffic_jam \
@@ -426,185 +440,27 @@ class Ship(Entity):
     #     else:
     #         return ordered_top_dirs
 
-    def best_four_moves_enemy(self, game, game_map):
-        arr_dirs = [[Direction.Still, Direction.North, Direction.East],
-                    [Direction.Still, Direction.North, Direction.West],
-                    [Direction.Still, Direction.South, Direction.East],
-                    [Direction.Still, Direction.South, Direction.West]]
-
-        orig_search_space = 4
-        search_space = orig_search_space
-        repeat = orig_search_space - 2
-
-        dict_scores = {}
-        dict_final_positions = {}
-        remember_best_halite_score = 0
-        if self.halite_amount < game_map[self.position].halite_amount * 0.1:
-            return Direction.Still
-        if game_map[self.position].halite_amount * 0.25 + self.halite_amount >= 1000:
-            return Direction.Still
-        for core_directions in arr_dirs:
-            permutations = list(itertools.product(core_directions, repeat = repeat))
-            for perm in permutations:
-                perm = tuple(list(perm) + [(0,0), (0,0)])
-                halite_counter = self.halite_amount
-                imaginary_pos = Position(self.position.x, self.position.y)
-                continue_loop = True
-                arr_all_pos_used = [Position(imaginary_pos.x,imaginary_pos.y)]
-                for iter in range(search_space):
-                    if continue_loop:
-                        mapcell = game_map[imaginary_pos]
-                        afford_to_move = halite_counter >= mapcell.adjusted_halite_amount * 0.1
-
-                        if perm[iter] == Direction.Still:
-                            halite_counter += mapcell.adjusted_halite_amount * 0.25
-                            mapcell.adjusted_halite_amount = 0.75 * mapcell.adjusted_halite_amount
-                            # if mapcell.is_inspiring >= 2:
-                            #     halite_counter += mapcell.adjusted_halite_amount * 0.75
-                            # else:
-                            #     halite_counter += mapcell.adjusted_halite_amount * 0.25
-                            # mapcell.adjusted_halite_amount = 0.75 * mapcell.adjusted_halite_amount
-
-                        elif not afford_to_move:
-                            continue_loop = False
-                            break
-
-                        else:
-                            imaginary_pos += Position(*perm[iter])
-                            imaginary_pos = game_map.normalize(imaginary_pos)
-                            mapcell = game_map[imaginary_pos]
-                            arr_all_pos_used.append(Position(imaginary_pos.x,imaginary_pos.y))
-                            halite_counter -= mapcell.adjusted_halite_amount * 0.1
-                        if mapcell.ship is not None and imaginary_pos != self.position:
-                            continue_loop = False
-                            break
-                        if halite_counter >= 1000:
-                            if iter + 1 < search_space:
-                                search_space = iter + 1
-                                remember_best_halite_score = halite_counter
-                                dict_final_positions = {perm[:search_space] : Position(imaginary_pos.x, imaginary_pos.y)}
-                            else:
-                                remember_best_halite_score = max(halite_counter,remember_best_halite_score)
-                                dict_final_positions[perm[:search_space]] = Position(imaginary_pos.x, imaginary_pos.y)
-                            dict_scores[perm[:search_space]] = halite_counter - self.halite_amount
-                            continue_loop = False
-                if continue_loop:
-                    dict_scores[perm[:search_space]] = halite_counter - self.halite_amount
-                    remember_best_halite_score = max(halite_counter, remember_best_halite_score)
-                game_map.reset_adjusted_halite_amount(arr_all_pos_used)
-        dict_scores = {key: dict_scores[key] for key in dict_scores.keys() if len(key) == search_space}
-        list_best_directions = sorted(dict_scores, key=dict_scores.get, reverse=True)
-        # return list_best_directions[0][0]
-        ordered_top_dirs = []
-        for item in list_best_directions:
-            if item[0] not in ordered_top_dirs:
-                ordered_top_dirs.append(item[0])
-            if len(ordered_top_dirs) == 2:
-                break
-        if len(ordered_top_dirs) == 1:
-            return ordered_top_dirs[0]
-        else:
-            return ordered_top_dirs
-
-    def best_four_moves_v2(self, game, game_map, logging, hurry_up):
-        arr_dirs = [[Direction.Still, Direction.North, Direction.East],
-                    [Direction.Still, Direction.North, Direction.West],
-                    [Direction.Still, Direction.South, Direction.East],
-                    [Direction.Still, Direction.South, Direction.West]]
-        if hurry_up:
-            orig_search_space = 4
-            search_space = orig_search_space
-            repeat = orig_search_space - 2
-        else:
-            orig_search_space = 6
-            search_space = orig_search_space
-            repeat = orig_search_space - 2
-
-        dict_scores = {}
-        dict_final_positions = {}
-        remember_best_halite_score = 0
+    def mines_without_searching(self, game_map):
+        """
+        :return: Whether the ship should stay and mine without searching, because it can't afford to move
+            or mining its cell fills it
+        """
         if self.halite_amount < game_map[self.position].halite_amount * 0.1:
-            return Direction.Still
-        if game_map[self.position].is_inspiring >= 2:
-            if game_map[self.position].halite_amount * 0.75 + self.halite_amount >= 1000:
-                return Direction.Still
+            return True
+        if game_map[self.position].is_inspiring >= constants.INSPIRATION_SHIP_COUNT:
+            return game_map[self.position].halite_amount * 0.75 + self.halite_amount >= 1000
         else:
-            if game_map[self.position].halite_amount * 0.25 + self.halite_amount >= 1000:
-                return Direction.Still
-
-        for core_directions in arr_dirs:
-            permutations = list(itertools.product(core_directions, repeat = repeat))
-            for perm in permutations:
-                perm = tuple(list(perm) + [(0,0), (0,0)])
-                halite_counter = self.halite_amount
-                imaginary_pos = Position(self.position.x, self.position.y)
-                continue_loop = True
-                arr_all_pos_used = [Position(imaginary_pos.x,imaginary_pos.y)]
-                for iter in range(search_space):
-                    if continue_loop:
-                        mapcell = game_map[imaginary_pos]
-                        afford_to_move = halite_counter >= mapcell.adjusted_halite_amount * 0.1
-
-                        if perm[iter] == Direction.Still:
-                            if mapcell.is_inspiring >= 2:
-                                halite_counter += mapcell.adjusted_halite_amount * 0.75
-                            else:
-                                halite_counter += mapcell.adjusted_halite_amount * 0.25
-                                mapcell.adjusted_halite_amount = 0.75 * mapcell.adjusted_halite_amount
-
-                        elif not afford_to_move:
-                            continue_loop = False
-                            break
-
-                        else:
-                            imaginary_pos += Position(*perm[iter])
-                            imaginary_pos = game_map.normalize(imaginary_pos)
-                            mapcell = game_map[imaginary_pos]
-                            arr_all_pos_used.append(Position(imaginary_pos.x,imaginary_pos.y))
-                            halite_counter -= mapcell.adjusted_halite_amount * 0.1
-                            if imaginary_pos in [entity.position for entity in game.me.get_dropoffs_and_shipyard()]:
-                                continue_loop = False
-                                break
-                            if mapcell.two_p_dangerous and halite_counter > 500 and iter > 0:
-                                continue_loop = False
-                                break
-                        if mapcell.is_occupied:
-                            if mapcell.ship.owner != game.me.id:
-                                if mapcell.ship.enemy_takedown_ship and halite_counter < 300:
-                                    halite_counter += 500
-
-                        if mapcell.is_occupied and imaginary_pos != self.position:
-                            if mapcell.ship.owner == game.me.id and iter < 1:
-                                if mapcell.ship.halite_amount < 700:
-                                    continue_loop = False
-                                    break
-                        if game_map[imaginary_pos].enemy_intention and iter == 0:
-                            if game.still_counts.get(self.id) is None:
-                                continue_loop = False
-                                break
-                            elif game.still_counts[self.id] < 6:
-                                continue_loop = False
-                                break
-                        if halite_counter >= 1000:
-                            if iter + 1 < search_space:
-                                search_space = iter + 1
-                                remember_best_halite_score = halite_counter
-                                dict_final_positions = {perm[:search_space] : Position(imaginary_pos.x, imaginary_pos.y)}
-                            else:
-                                remember_best_halite_score = max(halite_counter,remember_best_halite_score)
-                                dict_final_positions[perm[:search_space]] = Position(imaginary_pos.x, imaginary_pos.y)
-                            dict_scores[perm[:search_space]] = halite_counter - self.halite_amount
-                            continue_loop = False
-                if continue_loop:
-                    dict_scores[perm[:search_space]] = halite_counter - self.halite_amount
-                    remember_best_halite_score = max(halite_counter, remember_best_halite_score)
-                game_map.reset_adjusted_halite_amount(arr_all_pos_used)
-
-        dict_scores = {key: dict_scores[key] for key in dict_scores.keys() if len(key) == search_space}
-        list_best_directions = sorted(dict_scores, key=dict_scores.get, reverse=True)
+            return game_map[self.position].halite_amount * 0.25 + self.halite_amount >= 1000
 
+    def best_mining_moves(self, game, game_map, logging, orig_search_space, search_space, dict_scores, dict_final_positions):
+        """
+        Ranks the paths of a mining plan and picks the best two first moves from them.
+        :return: The best first move, or a list of the best two
+        """
         if search_space < orig_search_space:
             list_best_directions = self.choose_path_with_shortest_dist_home(game, game_map, dict_final_positions)
+        else:
+            list_best_directions = sorted(dict_scores, key=dict_scores.get, reverse=True)
 
         logging.info('best_directions: {}'.format(list_best_directions[:min(len(list_best_directions),2)]))
         ordered_top_dirs = []
@@ -621,18 +477,21 @@ class Ship(Entity):
     def choose_path_with_shortest_dist_home(self, game, game_map, dict_final_positions):
         unique_end_positions = list(set(dict_final_positions.values()))
         pos = unique_end_positions[0]
-        closest_dropoff = game.me.shipyard
-        closest_dist = game_map.calculate_distance(pos, closest_dropoff.position)
-        for entity in game.me.get_dropoffs():
-            if game_map.calculate_distance(pos, entity.position) < closest_dist:
-                closest_dist = game_map.calculate_distance(pos, entity.position)
-                closest_dropoff = entity
+        closest_dropoff = game_map.closest_structure(pos)
         dict_distances = {key: game_map.calculate_distance(dict_final_positions[key], closest_dropoff.position) for key in dict_final_positions.keys()}
         list_best_directions = sorted(dict_distances, key=dict_distances.get, reverse=False)
         return list_best_directions
 
-    def get_best_intention(self, game, game_map, logging, coordinator, command_queue, turn_start_time):
+    def get_best_intention(self, game, game_map, logging, coordinator, command_queue, deadline=None):
+        if self.get_fallback_intention(game, game_map, coordinator, command_queue):
+            self.search_intention(game, game_map, logging, deadline)
 
+    def get_fallback_intention(self, game, game_map, coordinator, command_queue):
+        """
+        Decides everything about the ship's move that doesn't need a path search, and gives it a cheap intention
+        to fall back on if the turn runs out of time before its search.
+        :return: Whether the intention should be improved by search_intention
+        """
         afford_to_move = self.halite_amount >= game_map[self.position].halite_amount * 0.1
 
         if coordinator.next_dropoff_zone is not None:
@@ -644,25 +503,24 @@ class Ship(Entity):
                     self.command_sent = True
                     coordinator.last_dropoff_turn = game.turn_number
                     coordinator.reset_dropoff_instructions()
-                    return
+                    return False
 
             if game.me.halite_amount + game_map[self.position].halite_amount + self.halite_amount > coordinator.adjust_halite_in_bank \
                     and not game_map[self.position].has_structure \
-                    and game.still_counts.get(self.id) is not None \
                     and game_map.calculate_distance(self.position, coordinator.next_dropoff_zone.center) < 3:
                     # and coordinator.next_dropoff_zone == self.coordinator_target_zone \
                     # and self.is_in_zone():
-                if game.still_counts[self.id] > 2:
+                if self.still_count > 2:
                     command_queue.append(self.make_dropoff())
                     self.command_sent = True
                     coordinator.last_dropoff_turn = game.turn_number
                     coordinator.reset_dropoff_instructions()
-                    return
+                    return False
 
         if not afford_to_move:
             self.best_intention = Direction.Still
-            return
-        if game_map[self.position].is_inspiring >= 2:
+            return False
+        if game_map[self.position].is_inspiring >= constants.INSPIRATION_SHIP_COUNT:
             halite_for_cell = 3 * game_map[self.position].halite_amount * 0.25
         else:
             halite_for_cell = game_map[self.position].halite_amount * 0.25
@@ -672,33 +530,61 @@ class Ship(Entity):
                 and halite_for_cell / 0.25 >= 2 * game.min_halite_to_take \
                 and halite_for_cell + self.halite_amount <= 1000:
             self.best_intention = Direction.Still
-            return
+            return False
         # if (self.mission == 'go_to_base' or self.mission == 'collect_from_zone') \
         if (self.mission == 'go_to_base') \
                 and halite_for_cell + self.halite_amount <= 1000 \
                 and halite_for_cell / 0.25 >= 2 * game.average_halite:
             self.best_intention = Direction.Still
-            return
-        hurry_up = False
-        if not debug_common.debug_mode and (datetime.now() - turn_start_time).total_seconds() > 1.3:
-            hurry_up = True
-            logging.info('hurried up')
+            return False
         if self.mission == 'collect_from_zone':
-            self.best_intention = self.best_four_moves_v2(game, game_map, logging, hurry_up)
+            # Collecting ships are searched together, see best_collecting_moves
+            self.best_intention = game.collecting_moves.get(self.id, Direction.Still)
+            return False
+        elif self.mission == 'go_to_base' or self.mission == 'final_base_return':
+            self.best_intention = self.best_moves_home(game_map)
+            return False
         else:
-            target_square = self.get_target_square(game)
-            if target_square is None:
+            self.target_for_search = self.get_target_square(game)
+            if self.target_for_search is None:
                 self.command_sent = True
-                return
-            self.best_intention = self.best_moves_to_base(game, game_map, target_square, hurry_up)
-            # self.best_intention = game_map.planned_navigate(self, target_square, best_intention=True)
+                return False
+            self.best_intention = game_map.naive_navigate(self, self.target_for_search, best_intention=True)
+        return True
+
+    def search_intention(self, game, game_map, logging, deadline=None):
+        """
+        Replaces the fallback intention with the best move a path search finds.
+        :param deadline: The time the search has to stop by, or None to search fully
+        :return: nothing.
+        """
+        self.best_intention = self.best_moves_to_base(game, game_map, self.target_for_search, deadline)
+        # self.best_intention = game_map.planned_navigate(self, target_square, best_intention=True)
 
-    def best_moves_to_base(self, game, game_map, target_square, hurry_up, ignore_friendly=True):
+    def best_moves_home(self, game_map):
+        """
+        Follows the turn's return cost field down towards whichever of my structures is cheapest to reach. A move
+        costs leaving this cell, moving onto the next and the return cost from there. The second best move is only
+        kept when it costs no more than staying a turn, as if moving onto this cell again, so it never leads away
+        from home.
+        :return: The best first move, or a list of the best two
+        """
+        stay_cost = game_map.return_costs.item(self.position.y, self.position.x)
+        if stay_cost == 0:
+            return Direction.Still
+        leave_cost = game_map.halite_amount.item(self.position.y, self.position.x) * 0.1
+        dict_costs = {}
+        for direction in Direction.get_all_cardinals():
+            pos = game_map.normalize(self.position.directional_offset(direction))
+            dict_costs[direction] = leave_cost + game_map.return_enter_costs.item(pos.y, pos.x) \
+                + game_map.return_costs.item(pos.y, pos.x)
+        best, second = sorted(dict_costs, key=dict_costs.get)[:2]
+        if dict_costs[second] < float('inf') and dict_costs[second] <= stay_cost + game_map.return_enter_costs.item(self.position.y, self.position.x):
+            return [best, second]
+        return best
+
+    def best_moves_to_base(self, game, game_map, target_square, deadline=None, ignore_friendly=True):
         general_directions = game_map.get_unsafe_moves(self.position, target_square)
-        if hurry_up:
-            max_search_space = 4
-        else:
-            max_search_space = 5
 
         all_arr = []
         for dir in general_directions:
@@ -724,37 +610,61 @@ class Ship(Entity):
             if item not in my_arr:
                 my_arr.append(item)
 
+        # Iterative deepening: the shallowest search always finishes, and each deeper one finds the prefixes of the
+        # one before it in the turn's path cache. The deepest search finished by the deadline is used.
+        dict_final_score = None
+        max_search_space = min(game_map.calculate_distance(self.position, target_square), BASE_SEARCH_SPACE)
+        for search_space in range(min(max_search_space, 1), max_search_space + 1):
+            clock = DeadlineClock(deadline if dict_final_score is not None else None)
+            try:
+                depth_scores = self.score_paths_to_base(game, game_map, target_square, my_arr, search_space, clock)
+            except SearchTimeout:
+                logging.info('base search stopped at search space {}'.format(search_space - 1))
+                break
+            dict_final_score = depth_scores
+
+        list_best_directions = sorted(dict_final_score, key=dict_final_score.get, reverse=False)
+        ordered_top_dirs = []
+
+        if len(list_best_directions) == 0:
+            return Direction.Still
+        for item in list_best_directions:
+            if item[0] not in ordered_top_dirs:
+                ordered_top_dirs.append(item[0])
+            if len(ordered_top_dirs) == 2:
+                break
+        if len(ordered_top_dirs) == 1:
+            return ordered_top_dirs[0]
+        else:
+            return ordered_top_dirs
+
+    def score_paths_to_base(self, game, game_map, target_square, my_arr, search_space, clock):
+        """
+        Scores the paths of best_moves_to_base that are search_space turns long.
+        :param my_arr: The pairs of directions the paths are made of
+        :param clock: The DeadlineClock of the search
+        :return: A dict of the paths ending closest to the target square to their scores, lower being better
+        """
         dict_final_pos = {}
         dict_final_score = {}
         dict_final_pos_incl_same_team = {}
         dict_final_score_incl_same_team = {}
-        search_space = min(game_map.calculate_distance(self.position, target_square), max_search_space)
+        cache_key = ('base', self.position.x, self.position.y, self.halite_amount < 300)
+        start = (self.position.x, self.position.y, 0)
         for gen_dir in my_arr:
             permutations = list(itertools.product(gen_dir, repeat=search_space))
             for perm in permutations:
+                clock.tick()
                 # looking to minimise score
-                score = 0
-                imaginary_pos = Position(self.position.x, self.position.y)
-                continue_loop = True
+                state = start
                 can_include_as_primary = True
                 for iter in range(search_space):
-                    if continue_loop:
-                        imaginary_pos = game_map.normalize(imaginary_pos + Position(*perm[iter]))
-                        mapcell = game_map[imaginary_pos]
-                        if mapcell.enemy_intention and iter == 0:
-                            continue_loop = False
-                            break
-                        if mapcell.is_occupied \
-                                or (mapcell.enemy_passive_takedown and self.halite_amount < 300):
-                            if mapcell.ship.owner != game.me.id:
-                                continue_loop = False
-                                break
-                            # if mapcell.ship.owner == game.me.id:
-                            #     can_include_as_primary = False
-                        if mapcell.two_p_dangerous:
-                            score += 400
-                        score += mapcell.halite_amount
-                if continue_loop:
+                    state = game.path_cache.lookup(cache_key + (perm[:iter + 1],), lambda: self._base_path_step(game, game_map, state, perm[iter], iter))
+                    if state is None:
+                        break
+                if state is not None:
+                    imaginary_pos = Position(state[0], state[1])
+                    score = state[2]
                     if can_include_as_primary:
                         dict_final_pos[perm] = game_map.calculate_distance(imaginary_pos, target_square)
                         dict_final_score[perm] = score
@@ -763,89 +673,28 @@ class Ship(Entity):
                         dict_final_score_incl_same_team[perm] = score
 
         dict_final_pos = {key:dict_final_pos[key] for key in dict_final_pos if dict_final_pos[key] <= min(dict_final_pos.values())}
-        dict_final_score = {key:dict_final_score[key] for key in dict_final_pos}
-        list_best_directions = sorted(dict_final_score, key=dict_final_score.get, reverse=False)
-        ordered_top_dirs = []
+        return {key:dict_final_score[key] for key in dict_final_pos}
 
-        if len(list_best_directions) == 0:
-            return Direction.Still
-        for item in list_best_directions:
-            if item[0] not in ordered_top_dirs:
-                ordered_top_dirs.append(item[0])
-            if len(ordered_top_dirs) == 2:
-                break
-        if len(ordered_top_dirs) == 1:
-            return ordered_top_dirs[0]
-        else:
-            return ordered_top_dirs
-
-
-    def get_intention(self, attempt_no = None):
-        if type(self.best_intention) is list:
-            if attempt_no == None: attempt_no = 1
-            if attempt_no // 5 == attempt_no / 5:
-                intention = self.best_intention[1]
-            else:
-                intention = self.best_intention[0]
-        else:
-            intention = self.best_intention
-        return intention
-
-    def best_intention_pos(self, attempt_no = None):
-        intention = self.get_intention(attempt_no)
-        return Position(intention[0], intention[1])
-
-    def resolve_intention(self, game, game_map, attempt_no):
-        intention = self.get_intention(attempt_no)
-        home_positions = [item.position for item in game.me.get_dropoffs() + [game.me.shipyard]]
-
-        normalised_pos = game_map.normalize(self.position + self.best_intention_pos(attempt_no))
-        occupied_by_enemy = False
-        if game_map[normalised_pos].is_occupied:
-            if game_map[normalised_pos].ship.owner != game.me.id:
-                occupied_by_enemy = True
-
-        if not game_map[normalised_pos].is_occupied \
-                and not game_map[normalised_pos].enemy_intention:
-            self.command_sent = True
-            game_map[self.position].mark_safe()
-            game_map[normalised_pos].mark_unsafe(self)
-            return self.move(intention)
-
-        elif occupied_by_enemy \
-                and game_map[normalised_pos].enemy_passive_takedown:
-            logging.info('passively collided with ship')
-            logging.info(self.position)
-            self.command_sent = True
-            game_map[self.position].mark_safe()
-            game_map[normalised_pos].mark_unsafe(self)
-            return self.move(intention)
-
-        elif game_map[normalised_pos].enemy_intention \
-                and not game_map[normalised_pos].is_occupied:
-            if game.still_counts.get(self.id) is not None:
-                if game.still_counts[self.id] > 6:
-                    logging.info('decided to go as still for too long')
-                    self.command_sent = True
-                    game_map[self.position].mark_safe()
-                    game_map[normalised_pos].mark_unsafe(self)
-                    return self.move(intention)
-
-        elif self.mission == 'final_base_return' and normalised_pos in home_positions:
-            self.command_sent = True
-            game_map[self.position].mark_safe()
-            return self.move(intention)
-
-        elif intention == Direction.Still:
-            self.command_sent = True
-            return self.stay_still()
-
-        elif occupied_by_enemy and len(game.players) == 2:
-            if game_map[normalised_pos].ship.enemy_takedown_ship:
-                self.command_sent = True
-                game_map[self.position].mark_safe()
-                game_map[normalised_pos].mark_unsafe(self)
-                return self.move(intention)
+    def _base_path_step(self, game, game_map, state, direction, iter):
+        """
+        Plays one turn of a path in best_moves_to_base.
+        :param state: The (x, y, score) the path has reached, lower scores being better
+        :return: The state after the turn, or None if the path is abandoned
+        """
+        x, y, score = state
+        x = (x + direction[0]) % game_map.width
+        y = (y + direction[1]) % game_map.height
+        mapcell = game_map[Position(x, y)]
+        if mapcell.enemy_intention and iter == 0:
+            return None
+        if mapcell.is_occupied \
+                or (mapcell.enemy_passive_takedown and self.halite_amount < 300):
+            if mapcell.ship.owner != game.me.id:
+                return None
+        if mapcell.two_p_dangerous:
+            score += 400
+        score += mapcell.halite_amount
+        return x, y, score
 
     def refresh_mission(self, game, coordinator, counter):
         if self.mission == None:
@@ -871,8 +720,8 @@ class Ship(Entity):
             #     logging.info('changing to collect from zone early for ship {}'.format(self.id))
             self.mission = 'collect_from_zone'
 
-        if self.mission == 'collect_from_zone' and game.still_counts.get(self.id) is not None:
-            if game.still_counts[self.id] >= 20:
+        if self.mission == 'collect_from_zone':
+            if self.still_count >= 20:
                 self.mission = 'go_to_base'
 
         home_positions = [item.position for item in game.me.get_dropoffs() + [game.me.shipyard]]
@@ -967,28 +816,24 @@ class Zone:
             self.x_end = game_map.width
         if self.y_end == final_zone_mark_height:
             self.y_end = game_map.height
-        loop_col_halite = 0
-        loop_dropoff_col_halite = 0
-        collective_population_metric = 0
-        counter_inspired = 0
-        enemy_collective_population_metric = 0
+        zone = (slice(self.y_start, self.y_end), slice(self.x_start, self.x_end))
+        zone_halite = game_map.halite_amount[zone]
+        loop_col_halite = int(zone_halite.sum())
+        loop_dropoff_col_halite = float(game_map.halite_to_count_for_new_dropoffs[zone].sum())
+        collective_population_metric = float(game_map.population_metric[zone].sum())
+        counter_inspired = int(np.count_nonzero(game_map.is_inspiring[zone] >= constants.INSPIRATION_SHIP_COUNT))
+        enemy_collective_population_metric = float(game_map.enemy_population_metric[zone].sum())
 
         pos_1 = [None, 0]
         pos_2 = [None, 0]
         pos_3 = [None, 0]
         pos_4 = [None, 0]
         pos_5 = [None, 0]
-        for x in range(self.x_start, self.x_end):
-            for y in range(self.y_start, self.y_end):
-                counter_inspired += 1 if game_map[Position(x, y)].is_inspiring >= 2 else 0
-                cell = game_map[Position(x, y)]
-                loop_col_halite += cell.halite_amount
-                loop_dropoff_col_halite += cell.halite_to_count_for_new_dropoffs
-                collective_population_metric += cell.population_metric
-                enemy_collective_population_metric += cell.enemy_population_metric
-                if cell.halite_amount > pos_5[1]:
+        for x, column in zip(range(self.x_start, self.x_end), zone_halite.T.tolist()):
+            for y, halite_amount in zip(range(self.y_start, self.y_end), column):
+                if halite_amount > pos_5[1]:
                     pos_5[0] = Position(x,y)
-                    pos_5[1] = game_map[pos_5[0]].halite_amount
+                    pos_5[1] = halite_amount
                 if pos_5[1] > pos_4[1]:
                     pos_tmp = pos_5
                     pos_5 = pos_4
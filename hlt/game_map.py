@@ -1,7 +1,11 @@
+import heapq
 import queue
 
+import numpy as np
+
 from . import constants
 from .entity import Entity, Shipyard, Ship, Dropoff
+from .influence import max_within
 from .positionals import Direction, Position
 from .common import read_input
 import logging
@@ -83,46 +87,142 @@ class Player:
         player, shipyard_x, shipyard_y = map(int, read_input().split())
         return Player(player, Shipyard(player, -1, Position(shipyard_x, shipyard_y)))
 
-    def _update(self, num_ships, num_dropoffs, halite):
+    def _update(self, halite, ships, dropoffs):
         """
         Updates this player object considering the input from the game engine for the current specific turn.
-        :param num_ships: The number of ships this player has this turn
-        :param num_dropoffs: The number of dropoffs this player has this turn
         :param halite: How much halite the player has in total
+        :param ships: Array of [ship_id, x, y, halite] rows for this player's ships this turn
+        :param dropoffs: Array of [dropoff_id, x, y] rows for this player's dropoffs this turn
         :return: nothing.
         """
         self.halite_amount = halite
-        self._ships = {id: ship for (id, ship) in [Ship._generate(self.id) for _ in range(num_ships)]}
-        self._dropoffs = {id: dropoff for (id, dropoff) in [Dropoff._generate(self.id) for _ in range(num_dropoffs)]}
+        # Ships and dropoffs are kept between turns: known ones are updated in place, new ones are
+        # created and any that are missing from the frame have been destroyed and are dropped.
+        updated_ships = {}
+        for ship_id, x_position, y_position, ship_halite in ships.tolist():
+            if ship_id in self._ships:
+                ship = self._ships[ship_id]
+                ship._update(x_position, y_position, ship_halite)
+            else:
+                ship_id, ship = Ship._generate(self.id, ship_id, x_position, y_position, ship_halite)
+            updated_ships[ship_id] = ship
+        self._ships = updated_ships
+        updated_dropoffs = {}
+        for dropoff_id, x_position, y_position in dropoffs.tolist():
+            if dropoff_id in self._dropoffs:
+                updated_dropoffs[dropoff_id] = self._dropoffs[dropoff_id]
+            else:
+                dropoff_id, updated_dropoffs[dropoff_id] = Dropoff._generate(self.id, dropoff_id, x_position, y_position)
+        self._dropoffs = updated_dropoffs
+
+
+# Bits of GameMap.flags
+ENEMY_INTENTION = 1
+ENEMY_PASSIVE_TAKEDOWN = 2
+TWO_P_DANGEROUS = 4
+CLOSE_TO_MY_DROPOFF = 8
+SHIP_RETURN_NO_GO = 16
+# The MapCell flag each bit backs
+FLAG_BITS = {'enemy_intention': ENEMY_INTENTION,
+             'enemy_passive_takedown': ENEMY_PASSIVE_TAKEDOWN,
+             'two_p_dangerous': TWO_P_DANGEROUS,
+             'close_to_my_dropoff': CLOSE_TO_MY_DROPOFF,
+             'ship_return_no_go': SHIP_RETURN_NO_GO}
+
+# Costs of a returning ship's turn in the return cost field, on top of the halite it spends to move
+RETURN_TURN_COST = 10
+RETURN_DANGER_COST = 40
+
+
+def _cell_field(name, writable=True):
+    """
+    Property of MapCell that reads and writes this cell's entry in the GameMap array of the same name.
+    :param writable: Whether the entry can be written through the cell, fields only the GameMap updates are read-only
+    """
+    def getter(cell):
+        return getattr(cell._game_map, name).item(cell._index)
+
+    def setter(cell, value):
+        getattr(cell._game_map, name)[cell._index] = value
+    return property(getter, setter if writable else None)
+
+
+def _cell_flag(bit):
+    """
+    Boolean property of MapCell backed by one bit of GameMap.flags.
+    """
+    def getter(cell):
+        return bool(cell._game_map.flags.item(cell._index) & bit)
+
+    def setter(cell, value):
+        flags = cell._game_map.flags.item(cell._index)
+        cell._game_map.flags[cell._index] = flags | bit if value else flags & ~bit
+        cell._game_map.marks_version += 1
+    return property(getter, setter)
 
 
 class MapCell:
-    """A cell on the game map."""
-    def __init__(self, position, halite_amount):
+    """
+    A cell on the game map.
+
+    The cell is a view onto its entry in the arrays held by the GameMap, only the structure is stored on the cell.
+    """
+    __slots__ = ('_game_map', '_index', 'position', 'structure', 'enemy_takedown_ship')
+
+    def __init__(self, game_map, position):
+        self._game_map = game_map
+        self._index = (position.y, position.x)
         self.position = position
-        self.halite_amount = halite_amount
-        self.adjusted_halite_amount = halite_amount
-        self.ship = None
         self.structure = None
-        self.targeted = None
-        self.ship_return_no_go = None
-        self.is_inspiring = 0
         # self.is_dangerous = False
         # self.fair_game = False
-        self.min_distance_to_dropoff = 1000
-        self.halite_to_count_for_new_dropoffs = 0
-        self.population_metric = 0
-        self.enemy_population_metric = 0
-        self.close_to_my_dropoff = False
-        self.enemy_intention = False
         # self.enemy_takedown = False
         self.enemy_takedown_ship = None
-        self.enemy_passive_takedown = False
-        self.two_p_dangerous = False
+
+    halite_amount = _cell_field('halite_amount')
+    # Searches simulate their mining in their own state, so the map they all read is never written while planning
+    adjusted_halite_amount = _cell_field('adjusted_halite_amount', writable=False)
+    is_inspiring = _cell_field('is_inspiring')
+    min_distance_to_dropoff = _cell_field('min_distance_to_dropoff')
+    halite_to_count_for_new_dropoffs = _cell_field('halite_to_count_for_new_dropoffs')
+    population_metric = _cell_field('population_metric')
+    enemy_population_metric = _cell_field('enemy_population_metric')
+    close_to_my_dropoff = _cell_flag(CLOSE_TO_MY_DROPOFF)
+    enemy_intention = _cell_flag(ENEMY_INTENTION)
+    enemy_passive_takedown = _cell_flag(ENEMY_PASSIVE_TAKEDOWN)
+    two_p_dangerous = _cell_flag(TWO_P_DANGEROUS)
+    ship_return_no_go = _cell_flag(SHIP_RETURN_NO_GO)
+
+    @property
+    def ship(self):
+        """
+        :return: The ship marked on this cell, or None
+        """
+        ship_id = self._game_map.ship_id.item(self._index)
+        return None if ship_id < 0 else self._game_map._ships[ship_id]
+
+    @ship.setter
+    def ship(self, ship):
+        self._game_map.marks_version += 1
+        if ship is None:
+            self._game_map.ship_owner[self._index] = -1
+            self._game_map.ship_id[self._index] = -1
+        else:
+            self._game_map._ships[ship.id] = ship
+            self._game_map.ship_owner[self._index] = ship.owner
+            self._game_map.ship_id[self._index] = ship.id
+
+    @property
+    def targeted(self):
+        """
+        :return: The id of the ship targeting this cell, or None
+        """
+        ship_id = self._game_map.targeted.item(self._index)
+        return None if ship_id < 0 else ship_id
 
     @property
     def halite_incl_inspired(self):
-        return self.halite_amount if self.is_inspiring < 2 else 3 * self.halite_amount
+        return self.halite_amount if self.is_inspiring < constants.INSPIRATION_SHIP_COUNT else 3 * self.halite_amount
 
     @property
     def is_empty(self):
@@ -136,7 +236,7 @@ class MapCell:
         """
         :return: Whether this cell has any ships
         """
-        return self.ship is not None
+        return self._game_map.ship_id.item(self._index) >= 0
 
     @property
     def has_structure(self):
@@ -151,8 +251,9 @@ class MapCell:
         :return: What is the structure type in this cell
         """
         return None if not self.structure else type(self.structure)
+
     def mark_target(self, ship):
-        self.targeted = ship.id
+        self._game_map.targeted[self._index] = ship.id
 
     def is_targeted(self):
         return self.targeted is not None
@@ -184,12 +285,52 @@ class GameMap:
 
     Can be indexed by a position, or by a contained entity.
     Coordinates start at 0. Coordinates are normalized for you
+
+    The state of every cell is held in height x width arrays, indexed [y, x]. They carry the names of
+    the MapCell attributes they back, so whole-map calculations can work on them directly.
     """
-    def __init__(self, cells, width, height):
+    def __init__(self, halite, width, height):
         self.width = width
         self.height = height
-        self._cells = cells
-        self._calculated_tot_halite = False
+        self.halite_amount = halite
+        self.adjusted_halite_amount = halite.astype(np.float64)
+        self.is_inspiring = np.zeros((height, width), dtype=np.int64)
+        self.min_distance_to_dropoff = np.full((height, width), 1000, dtype=np.int64)
+        self.distance_to_my_structure = np.full((height, width), 1000, dtype=np.int64)
+        self.closest_my_structure = np.zeros((height, width), dtype=np.int64)
+        self.halite_to_count_for_new_dropoffs = np.zeros((height, width), dtype=np.float64)
+        self.population_metric = np.zeros((height, width), dtype=np.float64)
+        self.enemy_population_metric = np.zeros((height, width), dtype=np.float64)
+        self.ship_owner = np.full((height, width), -1, dtype=np.int64)
+        self.ship_id = np.full((height, width), -1, dtype=np.int64)
+        self.targeted = np.full((height, width), -1, dtype=np.int64)
+        self.flags = np.zeros((height, width), dtype=np.uint8)
+        # Bumped whenever a ship or a flag is marked on a cell, so cached searches know the map has changed
+        self.marks_version = 0
+        # Ships marked on the map by id, so cells can hand back the ship objects
+        self._ships = {}
+        Position.build_pool(width, height)
+        self._cells = [[MapCell(self, Position(x, y)) for x in range(width)] for y in range(height)]
+        # Wrap-around distance for every (dy, dx) offset and the closest moves for every offset along each axis
+        x_distances = [min(dx, width - dx) for dx in range(width)]
+        y_distances = [min(dy, height - dy) for dy in range(height)]
+        self._distances = [[y_distance + x_distance for x_distance in x_distances] for y_distance in y_distances]
+        self._distance_array = np.array(self._distances)
+        self._x_moves = self._build_move_table(width, Direction.East, Direction.West)
+        self._y_moves = self._build_move_table(height, Direction.South, Direction.North)
+        self._structure_positions = None
+        # Kept up to date from the cells the engine reports as changed, see _update
+        self.total_halite = int(halite.sum())
+        # Diamond sum indexes over halite, all ships and my ships, rebuilt by Game.update_frame once ships are marked
+        self.halite_index = None
+        self.ship_index = None
+        self.my_ship_index = None
+        # Cost for a returning ship to get from every cell to my cheapest structure, and to move onto every cell,
+        # see update_return_costs
+        self.return_costs = None
+        self.return_enter_costs = None
+        # The most halite a ship can mine in a turn within each distance of every cell, see update_extractable_reach
+        self.extractable_reach = None
 
     def __getitem__(self, location):
         """
@@ -198,12 +339,28 @@ class GameMap:
         :return: the contents housing that cell or entity
         """
         if isinstance(location, Position):
-            location = self.normalize(location)
-            return self._cells[location.y][location.x]
+            return self._cells[location.y % self.height][location.x % self.width]
         elif isinstance(location, Entity):
             return self._cells[location.position.y][location.position.x]
         return None
 
+    def flag_mask(self, name):
+        """
+        :param name: The name of a MapCell flag, such as 'two_p_dangerous'
+        :return: A boolean array of the cells with that flag set
+        """
+        return (self.flags & FLAG_BITS[name]) != 0
+
+    def set_flag(self, name, mask):
+        """
+        Sets a MapCell flag on many cells at once.
+        :param name: The name of a MapCell flag, such as 'two_p_dangerous'
+        :param mask: A boolean array of the cells to set it on
+        :return: nothing.
+        """
+        self.flags[mask] |= FLAG_BITS[name]
+        self.marks_version += 1
+
     def calculate_distance(self, source, target):
         """
         Compute the Manhattan distance between two locations.
@@ -212,11 +369,7 @@ class GameMap:
         :param target: The target to where calculate
         :return: The distance between these items
         """
-        source = self.normalize(source)
-        target = self.normalize(target)
-        resulting_position = abs(source - target)
-        return min(resulting_position.x, self.width - resulting_position.x) + \
-            min(resulting_position.y, self.height - resulting_position.y)
+        return self._distances[(source.y - target.y) % self.height][(source.x - target.x) % self.width]
 
     def normalize(self, position):
         """
@@ -250,19 +403,25 @@ class GameMap:
         :param destination: The destination towards which you wish to move your object.
         :return: A list of valid (closest) Directions towards your target.
         """
-        source = self.normalize(source)
-        destination = self.normalize(destination)
-        possible_moves = []
-        distance = abs(destination - source)
-        y_cardinality, x_cardinality = self._get_target_direction(source, destination)
+        return list(self._x_moves[destination.x % self.width - source.x % self.width + self.width] +
+                    self._y_moves[destination.y % self.height - source.y % self.height + self.height])
 
-        if distance.x != 0:
-            possible_moves.append(x_cardinality if distance.x < (self.width / 2)
-                                  else Direction.invert(x_cardinality))
-        if distance.y != 0:
-            possible_moves.append(y_cardinality if distance.y < (self.height / 2)
-                                  else Direction.invert(y_cardinality))
-        return possible_moves
+    @staticmethod
+    def _build_move_table(size, forward, backward):
+        """
+        Builds the closest move along one axis for every offset from -size to size - 1 between two normalized
+        coordinates, as returned by get_unsafe_moves.
+        :return: A list of tuples holding no move or a single Direction, indexed by offset + size
+        """
+        moves = []
+        for offset in range(-size, size):
+            if offset == 0:
+                moves.append(())
+            elif offset > 0:
+                moves.append((forward if offset < size / 2 else backward,))
+            else:
+                moves.append((backward if -offset < size / 2 else forward,))
+        return moves
 
     def direct_traffic(self, ship_dock):
         for offset in [-3,-2,-1,1,2,3]:
@@ -343,92 +502,127 @@ class GameMap:
         :return: The map object
         """
         map_width, map_height = map(int, read_input().split())
-        game_map = [[None for _ in range(map_width)] for _ in range(map_height)]
-        for y_position in range(map_height):
-            cells = read_input().split()
-            for x_position in range(map_width):
-                game_map[y_position][x_position] = MapCell(Position(x_position, y_position),
-                                                           int(cells[x_position]))
-        return GameMap(game_map, map_width, map_height)
+        halite = np.array([read_input().split() for _ in range(map_height)], dtype=np.int64)
+        return GameMap(halite, map_width, map_height)
 
     def get_total_halite(self):
-        if self._calculated_tot_halite:
-            return self.total_halite
-        else:
-            tot_halite = 0
-            for y in range(self.height):
-                for x in range(self.width):
-                    tot_halite += self[Position(x, y)].halite_amount
-            self.total_halite = tot_halite
-            self._calculated_tot_halite = True
-            return self.total_halite
+        return self.total_halite
 
-    def _update(self, arr_dropoffs, coordinator):
+    def _update(self, cell_updates, my_structures, arr_dropoffs, coordinator):
         """
         Updates this map object from the input given by the game engine
+        :param cell_updates: Array of [x, y, halite] rows for the cells that changed this turn
+        :param my_structures: My shipyard followed by my dropoffs
+        :param arr_dropoffs: My structures and every player's shipyard
         :return: nothing
         """
         # Mark cells as safe for navigation (will re-mark unsafe cells
-        # later)
-        for y in range(self.height):
-            for x in range(self.width):
-                cell = self[Position(x, y)]
-                cell.ship = None
-                cell.ship_return_no_go = None
-                cell.targeted = None
-                cell.is_inspiring = 0
-
-                cell.enemy_intention = False
-                cell.enemy_passive_takedown = False
-                # cell.enemy_takedown = False
-                cell.enemy_takedown_ship = None
-                cell.two_p_dangerous = False
-
-                cell.population_metric = 0
-                cell.enemy_population_metric = 0
-                cell.close_to_my_dropoff = False
-
-
-        for _ in range(int(read_input())):
-            cell_x, cell_y, cell_energy = map(int, read_input().split())
-            self[Position(cell_x, cell_y)].halite_amount = cell_energy
-            self[Position(cell_x, cell_y)].adjusted_halite_amount = cell_energy
-
-        tot_halite = 0
-        for y in range(self.height):
-            for x in range(self.width):
-                tot_halite += self[Position(x, y)].halite_amount
-                min_distance_to_dropoff = min([self.calculate_distance(Position(x, y), entity.position) for entity in arr_dropoffs])
-                # self[Position(x, y)].min_distance_to_dropoff = min_distance_to_dropoff
-                self[Position(x, y)].halite_to_count_for_new_dropoffs = min(1, 1.2 ** (min_distance_to_dropoff - coordinator.dropoff_thresholds.search_distance)) * self[Position(x, y)].halite_amount
-        self.total_halite = tot_halite
-
-    def reset_adjusted_halite_amount(self, arr_all_pos_used):
-        for pos in arr_all_pos_used:
-            self[pos].adjusted_halite_amount = self[pos].halite_amount
-
-    def resolve_swaps(self, me, command_queue, second_choice = None):
-        if second_choice is None:
-            modifier = 1
+        # later). The per-turn marks are cleared with whole-array fills, which cost less than tracking the cells
+        # they were set on.
+        self.ship_owner.fill(-1)
+        self.ship_id.fill(-1)
+        self._ships = {}
+        self.marks_version += 1
+        self.targeted.fill(-1)
+        self.is_inspiring.fill(0)
+        self.flags.fill(0)
+        self.population_metric.fill(0)
+        self.enemy_population_metric.fill(0)
+
+        # Halite bookkeeping only visits the cells whose halite changed
+        cell_x, cell_y, cell_energy = cell_updates.T
+        self.total_halite += int((cell_energy - self.halite_amount[cell_y, cell_x]).sum())
+        self.halite_amount[cell_y, cell_x] = cell_energy
+        self.adjusted_halite_amount[cell_y, cell_x] = cell_energy
+
+        # Distances to structures only change when a dropoff is built
+        structure_positions = [entity.position for entity in arr_dropoffs]
+        if structure_positions != self._structure_positions:
+            self._structure_positions = structure_positions
+            self._update_structure_distances(my_structures, arr_dropoffs, coordinator.dropoff_thresholds.search_distance)
+            self.halite_to_count_for_new_dropoffs = self._new_dropoff_share * self.halite_amount
         else:
-            modifier = 5
-        for ship in [ship for ship in me.get_ships() if not ship.command_sent]:
-            for comparison_ship in [ship for ship in me.get_ships() if not ship.command_sent]:
-                if ship.id != comparison_ship.id \
-                        and not ship.command_sent and not comparison_ship.command_sent \
-                        and self.normalize(ship.position + ship.best_intention_pos(modifier)) == self.normalize(comparison_ship.position) \
-                        and self.normalize(comparison_ship.position + comparison_ship.best_intention_pos()) == self.normalize(ship.position):
-                    if second_choice:
-                        logging.info('swapped ships based on their second choice')
-                        logging.info('ship ids: {} and {}'.format(ship.id, comparison_ship.id))
-                    single_instruction = ship.move(ship.get_intention(modifier))
-                    ship.command_sent = True
-                    self[self.normalize(ship.position + Position(*ship.get_intention(modifier)))].mark_unsafe(ship)
-                    command_queue.append(single_instruction)
-                    single_instruction = comparison_ship.move(comparison_ship.get_intention())
-                    comparison_ship.command_sent = True
-                    self[self.normalize(comparison_ship.position + Position(*comparison_ship.get_intention()))].mark_unsafe(comparison_ship)
-                    command_queue.append(single_instruction)
+            self.halite_to_count_for_new_dropoffs[cell_y, cell_x] = self._new_dropoff_share[cell_y, cell_x] * cell_energy
+
+    def _distance_field(self, position):
+        """
+        :return: A height x width array of the wrap-around distance from every cell to the position
+        """
+        return np.roll(self._distance_array, (position.y, position.x), axis=(0, 1))
+
+    def _update_structure_distances(self, my_structures, arr_dropoffs, search_distance):
+        """
+        Recomputes the cached distance fields to the structures, only needed when the structures change.
+        :param my_structures: My shipyard followed by my dropoffs
+        :param arr_dropoffs: My structures and every player's shipyard
+        :param search_distance: Distance from existing structures beyond which halite fully counts for new dropoffs
+        :return: nothing
+        """
+        self._my_structures = my_structures
+        my_distances = np.stack([self._distance_field(entity.position) for entity in my_structures])
+        # argmin keeps the first of equally close structures, so ties go to the shipyard
+        self.closest_my_structure = my_distances.argmin(axis=0)
+        self.distance_to_my_structure = my_distances.min(axis=0)
+        self.min_distance_to_dropoff = np.minimum.reduce([self._distance_field(entity.position) for entity in arr_dropoffs])
+        distance_factors = np.array([min(1, 1.2 ** (distance - search_distance))
+                                     for distance in range(self.width + self.height)])
+        self._new_dropoff_share = distance_factors[self.min_distance_to_dropoff]
+
+    def update_extractable_reach(self, me, radius):
+        """
+        Finds the most halite a ship could mine in a turn within each distance of every cell, which bounds what
+        mining searches can still gain. An enemy ship to take down counts as a full ship's worth.
+        :param me: My player
+        :param radius: The furthest distance the searches move
+        :return: nothing.
+        """
+        inspired = self.is_inspiring >= constants.INSPIRATION_SHIP_COUNT
+        extractable = self.adjusted_halite_amount * np.where(inspired, 0.75, 0.25)
+        for ship in self._ships.values():
+            if ship.owner != me.id and ship.enemy_takedown_ship:
+                extractable[ship.position.y, ship.position.x] = constants.MAX_HALITE
+        self.extractable_reach = max_within(extractable, radius)
+
+    def update_return_costs(self, me):
+        """
+        Runs Dijkstra out from my structures to find what it costs to get home from every cell. Moving off a cell
+        costs the halite spent to leave it plus RETURN_TURN_COST, and moving onto a cell that is dangerous, marked
+        as an enemy's intention or holds an enemy ship costs RETURN_DANGER_COST more.
+        A cell's return cost doesn't include moving onto it, which is kept in return_enter_costs.
+        :param me: My player
+        :return: nothing.
+        """
+        width, height = self.width, self.height
+        move_costs = (self.halite_amount * 0.1).tolist()
+        dangerous = ((self.flags & (TWO_P_DANGEROUS | ENEMY_INTENTION)) != 0) | ((self.ship_id >= 0) & (self.ship_owner != me.id))
+        self.return_enter_costs = np.where(dangerous, RETURN_TURN_COST + RETURN_DANGER_COST, RETURN_TURN_COST)
+        enter_costs = self.return_enter_costs.tolist()
+        costs = [[float('inf')] * width for _ in range(height)]
+        heap = []
+        for entity in me.get_dropoffs_and_shipyard():
+            costs[entity.position.y][entity.position.x] = 0
+            heap.append((0, entity.position.x, entity.position.y))
+        heapq.heapify(heap)
+        while heap:
+            cost, x, y = heapq.heappop(heap)
+            if cost > costs[y][x]:
+                continue
+            # Step back to every neighbour, which reaches this cell in one move
+            for from_x, from_y in ((x, (y - 1) % height), (x, (y + 1) % height), ((x + 1) % width, y), ((x - 1) % width, y)):
+                from_cost = cost + move_costs[from_y][from_x] + enter_costs[y][x]
+                if from_cost < costs[from_y][from_x]:
+                    costs[from_y][from_x] = from_cost
+                    heapq.heappush(heap, (from_cost, from_x, from_y))
+        self.return_costs = np.array(costs)
+
+    def closest_structure(self, position):
+        """
+        Returns which of my structures is closest to a position, preferring the shipyard and then the oldest dropoff
+        when several are equally close.
+        :param position: The position to search from
+        :return: The shipyard or dropoff entity
+        """
+        return self._my_structures[self.closest_my_structure.item(position.y % self.height, position.x % self.width)]
 
     def get_marked_position(self, me):
         dict_positions = {}
@@ -0,0 +1,242 @@
+"""
+Toroidal influence maps, built by convolving ship occupancy grids with diamond (Manhattan radius) kernels.
+"""
+import logging
+
+import numpy as np
+
+from . import constants
+
+# Ships spread population influence over this Manhattan radius, weighted by POPULATION_DECAY ** -distance
+POPULATION_RADIUS = 8
+POPULATION_DECAY = 1.1
+
+
+def ring_offsets(distance):
+    """
+    Lists the offsets lying at exactly the given Manhattan distance from the origin.
+    :param distance: The Manhattan distance of the ring
+    :return: A list of (dx, dy) tuples
+    """
+    if distance == 0:
+        return [(0, 0)]
+    offsets = []
+    for dx in range(-distance, distance + 1):
+        dy = distance - abs(dx)
+        offsets.append((dx, dy))
+        if dy:
+            offsets.append((dx, -dy))
+    return offsets
+
+
+def ring_sums(grid, radius):
+    """
+    Sums a toroidal grid over each ring of a diamond kernel centred on every cell.
+    The grid is padded with its own wrapped edges once, so every offset is a plain slice.
+    :param grid: A 2D array indexed [y][x]
+    :param radius: The largest Manhattan distance to sum over
+    :return: A list where entry d holds, for every cell, the sum of the grid at exactly distance d from it
+    """
+    height, width = grid.shape
+    padded = np.pad(grid, radius, mode='wrap')
+    rings = []
+    for distance in range(radius + 1):
+        ring = np.zeros_like(grid)
+        for dx, dy in ring_offsets(distance):
+            ring += padded[radius + dy:radius + dy + height, radius + dx:radius + dx + width]
+        rings.append(ring)
+    return rings
+
+
+def count_within(rings, radius):
+    """
+    Collapses ring sums into a plain diamond sum.
+    :param rings: The ring sums from ring_sums
+    :param radius: The Manhattan radius to count within
+    :return: For every cell, the sum of the grid within the radius
+    """
+    total = np.zeros_like(rings[0])
+    for ring in rings[:radius + 1]:
+        total += ring
+    return total
+
+
+def population_metric(rings):
+    """
+    Collapses ring sums into the distance weighted population metric.
+    :param rings: The ring sums from ring_sums, covering at least POPULATION_RADIUS
+    :return: For every cell, the sum of POPULATION_DECAY ** -distance over the ships around it
+    """
+    metric = np.zeros(rings[0].shape, dtype=np.float64)
+    for distance, ring in enumerate(rings[:POPULATION_RADIUS + 1]):
+        metric += POPULATION_DECAY ** -distance * ring
+    return metric
+
+
+def max_within(grid, radius):
+    """
+    Takes the maximum of a toroidal grid over growing diamonds, by dilating it one step at a time.
+    :param grid: A 2D array indexed [y][x]
+    :param radius: The largest Manhattan radius to take the maximum over
+    :return: A list where entry r holds, for every cell, the maximum of the grid within distance r of it
+    """
+    maxima = [grid]
+    for _ in range(radius):
+        previous = maxima[-1]
+        maxima.append(np.maximum.reduce([previous,
+                                         np.roll(previous, 1, axis=0), np.roll(previous, -1, axis=0),
+                                         np.roll(previous, 1, axis=1), np.roll(previous, -1, axis=1)]))
+    return maxima
+
+
+class DiamondSumIndex:
+    """
+    Answers "sum of a toroidal grid within Manhattan radius r of a cell" in constant time.
+
+    The grid is padded with its wrapped edges and rotated by 45 degrees (u = x + y, v = x - y), which turns every
+    diamond into an axis aligned square, so a summed-area table over the rotated grid answers it with four lookups.
+    """
+    def __init__(self, grid, max_radius):
+        """
+        :param grid: A 2D array indexed [y][x]
+        :param max_radius: The largest radius that will be queried
+        """
+        self.height, self.width = grid.shape
+        self.max_radius = max_radius
+        padded = np.pad(grid.astype(np.float64 if grid.dtype.kind == 'f' else np.int64), max_radius, mode='wrap')
+        ys, xs = np.indices(padded.shape)
+        self._v_offset = padded.shape[0] - 1
+        size = padded.shape[0] + padded.shape[1] - 1
+        rotated = np.zeros((size, size), dtype=padded.dtype)
+        rotated[xs + ys, xs - ys + self._v_offset] = padded
+        self._table = np.zeros((size + 1, size + 1), dtype=padded.dtype)
+        self._table[1:, 1:] = rotated.cumsum(axis=0).cumsum(axis=1)
+
+    def sum_within(self, position, radius):
+        """
+        :param position: The centre of the diamond
+        :param radius: The Manhattan radius, at most max_radius
+        :return: The sum of the grid over every cell within the radius of the position
+        """
+        x = position.x % self.width + self.max_radius
+        y = position.y % self.height + self.max_radius
+        u = x + y
+        v = x - y + self._v_offset
+        table = self._table
+        return table.item(u + radius + 1, v + radius + 1) - table.item(u - radius, v + radius + 1) \
+            - table.item(u + radius + 1, v - radius) + table.item(u - radius, v - radius)
+
+    def sums_within(self, xs, ys, radius):
+        """
+        The array version of sum_within, for many cells at once.
+        :param xs: An array of the x of every centre
+        :param ys: An array of the y of every centre
+        :param radius: The Manhattan radius, at most max_radius
+        :return: An array of the sum of the grid within the radius of every centre
+        """
+        x = np.asarray(xs) % self.width + self.max_radius
+        y = np.asarray(ys) % self.height + self.max_radius
+        u = x + y
+        v = x - y + self._v_offset
+        table = self._table
+        return table[u + radius + 1, v + radius + 1] - table[u - radius, v + radius + 1] \
+            - table[u + radius + 1, v - radius] + table[u - radius, v - radius]
+
+
+class InfluenceMaps:
+    """
+    Keeps every ship's diamond kernel splatted into per-distance ring counts between turns, so a turn only
+    re-splats the ships that moved, spawned or died. The counts are integers, so the incremental updates are exact;
+    the full rebuild every rebuild_interval turns is a guard against any ship bookkeeping going astray.
+    """
+    def __init__(self, width, height, rebuild_interval=50, check=False):
+        """
+        :param width: The width of the map
+        :param height: The height of the map
+        :param rebuild_interval: The number of turns between full rebuilds
+        :param check: Whether to compare every incremental update against a full rebuild
+        """
+        self.width = width
+        self.height = height
+        self.radius = max(constants.INSPIRATION_RADIUS, POPULATION_RADIUS)
+        self.rebuild_interval = rebuild_interval
+        self.check = check
+        self.my_rings = np.zeros((self.radius + 1, height, width), dtype=np.int64)
+        self.enemy_rings = np.zeros_like(self.my_rings)
+        self._ship_cells = {}
+        self._turns_since_rebuild = 0
+
+        footprint = [(distance, dx, dy) for distance in range(self.radius + 1) for dx, dy in ring_offsets(distance)]
+        self._footprint_ring = np.array([distance * height * width for distance, _, _ in footprint], dtype=np.int64)
+        self._footprint_dx = np.array([dx for _, dx, _ in footprint], dtype=np.int64)
+        self._footprint_dy = np.array([dy for _, _, dy in footprint], dtype=np.int64)
+
+    def update(self, ship_cells):
+        """
+        Brings the ring counts up to date with this turn's ships.
+        :param ship_cells: A dict of ship id to (is_mine, x, y) for every ship on the map
+        :return: nothing.
+        """
+        self._turns_since_rebuild += 1
+        if self._turns_since_rebuild >= self.rebuild_interval:
+            self._rebuild(ship_cells)
+        else:
+            removed = [cell for ship_id, cell in self._ship_cells.items() if ship_cells.get(ship_id) != cell]
+            added = [cell for ship_id, cell in ship_cells.items() if self._ship_cells.get(ship_id) != cell]
+            for is_mine, rings in ((True, self.my_rings), (False, self.enemy_rings)):
+                rings += self._splat([cell for cell in added if cell[0] == is_mine])
+                rings -= self._splat([cell for cell in removed if cell[0] == is_mine])
+            if self.check:
+                my_rings, enemy_rings = self.my_rings, self.enemy_rings
+                self._rebuild(ship_cells)
+                if not (np.array_equal(my_rings, self.my_rings) and np.array_equal(enemy_rings, self.enemy_rings)):
+                    logging.error('incremental influence maps diverged from the full rebuild')
+        self._ship_cells = ship_cells
+
+    def inspiring_counts(self):
+        """
+        :return: For every cell, the number of enemy ships within the inspiration radius
+        """
+        return count_within(self.enemy_rings, constants.INSPIRATION_RADIUS)
+
+    def population_metric(self):
+        """
+        :return: For every cell, the population metric of my ships
+        """
+        return population_metric(self.my_rings)
+
+    def enemy_population_metric(self):
+        """
+        :return: For every cell, the population metric of enemy ships
+        """
+        return population_metric(self.enemy_rings)
+
+    def _splat(self, cells):
+        """
+        Counts the kernel footprints of a batch of ships into ring layers.
+        :param cells: A list of (is_mine, x, y) tuples
+        :return: An array shaped like the ring counts, or 0 if there are no ships
+        """
+        if not cells:
+            return 0
+        xs = np.array([x for _, x, _ in cells], dtype=np.int64)
+        ys = np.array([y for _, _, y in cells], dtype=np.int64)
+        columns = (xs[:, None] + self._footprint_dx) % self.width
+        rows = (ys[:, None] + self._footprint_dy) % self.height
+        indices = self._footprint_ring + rows * self.width + columns
+        counts = np.bincount(indices.ravel(), minlength=self.my_rings.size)
+        return counts.reshape(self.my_rings.shape)
+
+    def _rebuild(self, ship_cells):
+        """
+        Recomputes the ring counts from scratch by convolving this turn's occupancy.
+        :param ship_cells: A dict of ship id to (is_mine, x, y) for every ship on the map
+        :return: nothing.
+        """
+        my_ships = np.zeros((self.height, self.width), dtype=np.int64)
+        enemy_ships = np.zeros_like(my_ships)
+        for is_mine, x, y in ship_cells.values():
+            (my_ships if is_mine else enemy_ships)[y, x] += 1
+        self.my_rings = np.array(ring_sums(my_ships, self.radius))
+        self.enemy_rings = np.array(ring_sums(enemy_ships, self.radius))
+        self._turns_since_rebuild = 0
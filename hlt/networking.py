@@ -2,13 +2,16 @@ import json
 import logging
 import sys
 
-from .common import read_input
+from .common import read_input, read_frame
 from . import constants
 from .game_map import GameMap, Player
+from .influence import DiamondSumIndex, InfluenceMaps
+from .planning import PathCache
 from .positionals import Position
 from datetime import datetime
 from pathfinding.core.grid import Grid
 import numpy as np
+import debug_common
 
 
 class Game:
@@ -39,7 +42,8 @@ class Game:
             self.players[player] = Player._generate()
         self.me = self.players[self.my_id]
         self.game_map = GameMap._generate()
-        self.game_missions = {}
+        self.influence = InfluenceMaps(self.game_map.width, self.game_map.height, check=debug_common.debug_mode)
+        self.path_cache = PathCache(self.game_map)
         self.total_halite_for_ship = {}
         self.turn_ship_created = {}
         self.min_halite_to_take = 50
@@ -48,9 +52,9 @@ class Game:
         self.dict_positions = {}
         self.destroyed_by_enemy_count = 0
         self.check_for_dropoffs = True
+        # Mining moves of the collecting ships, scored together each turn before the ships pick their intentions
+        self.collecting_moves = {}
         # self.dict_ship_had_to_wait = {}
-        self.still_counts = {}
-        self.last_positions = {}
 
     def ready(self, name):
         """
@@ -64,19 +68,21 @@ class Game:
         Updates the game object's state.
         :returns: nothing.
         """
-        self.turn_number = int(read_input())
+        self.turn_number, players, ships, dropoffs, cells = read_frame(len(self.players))
         logging.info("=============== TURN {:03} ================".format(self.turn_number))
+        logging.info('path cache hits: {}, misses: {}'.format(self.path_cache.hits, self.path_cache.misses))
+        self.path_cache = PathCache(self.game_map)
 
-        for _ in range(len(self.players)):
-            player, num_ships, num_dropoffs, halite = map(int, read_input().split())
-            self.players[player]._update(num_ships, num_dropoffs, halite)
+        for player, num_ships, num_dropoffs, halite in players.tolist():
+            self.players[player]._update(halite, ships[ships[:, 0] == player, 1:], dropoffs[dropoffs[:, 0] == player, 1:])
 
         turn_start_time = datetime.now()
         arr_dropoffs_and_enemy_shipyards = self.me.get_dropoffs_and_shipyard()
         for player in self.players.values():
             arr_dropoffs_and_enemy_shipyards.append(player.shipyard)
 
-        self.game_map._update(arr_dropoffs_and_enemy_shipyards, coordinator)
+        my_structures = [self.me.shipyard] + self.me.get_dropoffs()
+        self.game_map._update(cells, my_structures, arr_dropoffs_and_enemy_shipyards, coordinator)
 
         search_space = 3
         for entity in self.me.get_dropoffs_and_shipyard():
@@ -87,35 +93,33 @@ class Game:
                         self.game_map[pos].close_to_my_dropoff = True
 
         # Mark cells with ships as unsafe for navigation
+        ship_cells = {}
         for player in self.players.values():
             for ship in player.get_ships():
                 self.game_map[ship.position].mark_unsafe(ship)
-                if player.id != self.me.id:
-                    for x in range(-8,9):
-                        for y in range(-8,9):
-                            if abs(x) + abs(y) <= 4:
-                                self.game_map[self.game_map.normalize(ship.position + Position(x,y))].is_inspiring += 1
-                            if abs(x) + abs(y) <= 8:
-                                self.game_map[self.game_map.normalize(ship.position + Position(x, y))].enemy_population_metric += 1.1 ** (-abs(x) - abs(y))
-                else:
-                    for x in range(-8,9):
-                        for y in range(-8,9):
-                            if abs(x) + abs(y) <= 8:
-                                self.game_map[self.game_map.normalize(ship.position + Position(x, y))].population_metric += 1.1 ** (-abs(x) - abs(y))
+                ship_cells[ship.id] = (player.id == self.me.id, ship.position.x, ship.position.y)
             self.game_map[player.shipyard.position].structure = player.shipyard
             for dropoff in player.get_dropoffs():
                 self.game_map[dropoff.position].structure = dropoff
 
+        # Only ships that changed cell since last turn are re-splatted into the influence maps
+        self.influence.update(ship_cells)
+        self.game_map.is_inspiring[...] = self.influence.inspiring_counts()
+        self.game_map.enemy_population_metric[...] = self.influence.enemy_population_metric()
+        self.game_map.population_metric[...] = self.influence.population_metric()
+
         for entity in self.me.get_dropoffs_and_shipyard():
             if self.game_map[entity.position].is_occupied:
                 if self.game_map[entity.position].ship.owner != self.me.id:
                     self.game_map[entity.position].mark_safe()
-            halite_counter = 0
-            for x in range(-8,9):
-                for y in range(-8,9):
-                    if abs(x) + abs(y) <= 8:
-                        halite_counter += self.game_map[self.game_map.normalize(entity.position + Position(x,y))].halite_amount
-            entity.surrounding_value = halite_counter
+
+        # Radius queries over halite and ships are answered from diamond sum indexes for the rest of the turn
+        self.game_map.halite_index = DiamondSumIndex(self.game_map.halite_amount, 8)
+        ship_radius = max(constants.INSPIRATION_RADIUS, 4)
+        self.game_map.ship_index = DiamondSumIndex(self.game_map.ship_id >= 0, ship_radius)
+        self.game_map.my_ship_index = DiamondSumIndex(self.game_map.ship_owner == self.me.id, ship_radius)
+        for entity in self.me.get_dropoffs_and_shipyard():
+            entity.surrounding_value = self.game_map.halite_index.sum_within(entity.position, 8)
 
         return turn_start_time
 
@@ -125,17 +129,17 @@ class Game:
         #         logging.info('someone has crashed into me at {}'.format(self.dict_positions[key]))
         #         self.destroyed_by_enemy_count += 1
 
-        for ship in self.me.get_ships():
-            if ship.id not in self.still_counts.keys():
-                self.still_counts[ship.id] = 0
-            if ship.id in self.last_positions.keys():
-                if ship.position == self.last_positions[ship.id]:
-                    self.still_counts[ship.id] += 1
-                else:
-                    self.still_counts[ship.id] = 0
-            if ship.id in self.game_missions.keys():
-                ship.mission = self.game_missions.get(ship.id)
+        # Free cells near a ship score 3 if rich and 1 if worth taking, summed over a radius of 2 below
+        halite = self.game_map.halite_amount
+        worth_taking = (halite >= self.min_halite_to_take * 1.5) \
+            | ((self.game_map.is_inspiring >= constants.INSPIRATION_SHIP_COUNT) & (halite >= self.min_halite_to_take))
+        cell_scores = np.where(halite >= self.min_halite_to_take * 3, 3, np.where(worth_taking, 1, 0))
+        cell_scores[self.game_map.ship_id >= 0] = 0
+        zone_cell_index = DiamondSumIndex(cell_scores, 2)
 
+        for ship in self.me.get_ships():
+            # The coordinator owns zone assignments, a ship only keeps its target square while it has a zone
+            ship.coordinator_target_zone = None
             if ship.id in coordinator.assigned_targets.keys():
                 zone = coordinator.assigned_targets[ship.id]
                 if zone.halite_per_square >= self.min_halite_to_take \
@@ -145,28 +149,12 @@ class Game:
                 else:
                     logging.info('dropping zone for ship: {}'.format(ship.id))
                     coordinator.assigned_targets.pop(ship.id, None)
-            if ship.id in coordinator.assigned_target_squares.keys():
-                if ship.coordinator_target_zone is not None:
-                    ship.target_square = coordinator.assigned_target_squares[ship.id]
-
-            if ship.id in self.still_counts.keys():
-                ship.still_count = self.still_counts.get(ship.id)
+            if ship.coordinator_target_zone is None:
+                ship.target_square = None
 
             counter = 0
             if ship.mission == 'go_to_zone':
-                for x in range(-3,4):
-                    for y in range(-3,4):
-                        if abs(x) + abs(y) <= 2:
-                            adj_pos = ship.position + Position(x,y)
-                            cell = self.game_map[adj_pos]
-                            if not cell.is_occupied:
-                                if cell.halite_amount >= self.min_halite_to_take * 3:
-                                    counter += 3
-                                elif cell.halite_amount >= self.min_halite_to_take * 1.5 \
-                                        or (cell.is_inspiring >= 2 and cell.halite_amount >= self.min_halite_to_take):
-                                    counter += 1
-                            # elif cell.fair_game and ship.halite_amount < 300:
-                            #     counter += 3
+                counter = zone_cell_index.sum_within(ship.position, 2)
             ship.refresh_mission(self, coordinator, counter)
 
 
@@ -182,9 +170,10 @@ class Game:
 
 def send_commands(commands):
     """
-    Sends a list of commands to the engine.
+    Sends a list of commands to the engine in a single write.
     :param commands: The list of commands to send.
     :return: nothing.
     """
-    print(" ".join(commands))
     sys.stdout.flush()
+    sys.stdout.buffer.write((" ".join(commands) + "\n").encode())
+    sys.stdout.buffer.flush()
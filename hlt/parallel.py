@@ -0,0 +1,228 @@
+"""
+Optional pool of worker processes that run the ships' path searches in parallel.
+
+The workers are forked before the game starts, so each holds its own copy of the pre-game Game. Every turn the map
+arrays the searches read and a table of the ships are copied into shared memory, the ships to search are dealt out
+to the workers, and their intentions are gathered back before the moves are resolved.
+
+The shared tables are double buffered, turns taking the two buffers in turn, so a worker still finishing last turn's
+searches keeps reading last turn's buffer while this turn is published into the other.
+"""
+import atexit
+import logging
+import multiprocessing
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .entity import Dropoff, Ship
+from .planning import PathCache, share_deadline
+from .positionals import Position
+
+# The number of worker processes, 0 runs every search in the main process
+SEARCH_WORKERS = 0
+# How long past the search deadline to wait for a worker's results before leaving its ships on their fallbacks
+GATHER_GRACE_SECONDS = 0.1
+
+# The GameMap arrays the searches read, published each turn
+SHARED_MAP_ARRAYS = [('halite_amount', np.int64),
+                     ('adjusted_halite_amount', np.float64),
+                     ('is_inspiring', np.int64),
+                     ('flags', np.uint8),
+                     ('ship_id', np.int64),
+                     ('ship_owner', np.int64),
+                     ('closest_my_structure', np.int64)]
+# The columns of the shared ship table
+SHIP_COLUMNS = ['id', 'owner', 'x', 'y', 'halite_amount', 'still_count', 'enemy_takedown_ship']
+
+
+class SearchPool:
+    """
+    Runs Ship.search_intention for many ships across worker processes.
+    """
+    def __init__(self, game, workers):
+        """
+        Creates the shared memory and forks the workers, which has to happen before Game.ready.
+        :param game: The game, still in its pre-game state
+        :param workers: The number of worker processes
+        """
+        game_map = game.game_map
+        self.turn = 0
+        self._blocks = []
+        self.map_arrays = [{name: self._shared_array((game_map.height, game_map.width), dtype)
+                            for name, dtype in SHARED_MAP_ARRAYS} for _ in range(2)]
+        # A ship per cell is more than the map can hold
+        self.ship_tables = [self._shared_array((game_map.width * game_map.height, len(SHIP_COLUMNS)), np.int64)
+                            for _ in range(2)]
+        # The turns each worker was sent and hasn't answered yet, oldest first
+        self._pending = [[] for _ in range(workers)]
+        atexit.register(self.close)
+
+        context = multiprocessing.get_context('fork')
+        self._connections = []
+        self._processes = []
+        for index in range(workers):
+            connection, worker_connection = context.Pipe()
+            self._connections.append(connection)
+            process = context.Process(target=_worker_main, args=(worker_connection, game, self, index), daemon=True)
+            process.start()
+            worker_connection.close()
+            self._processes.append(process)
+
+    def _shared_array(self, shape, dtype):
+        """
+        :return: An array of the given shape backed by a new block of shared memory
+        """
+        # Shared memory needs Python 3.8, so it is only imported once a pool is made
+        from multiprocessing import shared_memory
+        block = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+        self._blocks.append(block)
+        return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    def search(self, game, game_map, ships, turn_deadline):
+        """
+        Searches the ships' intentions on the workers, giving each worker every n-th ship so each gets a share of
+        every priority tier.
+        :param ships: The ships to search, most urgent first
+        :param turn_deadline: The time every search has to stop by, or None if there are no deadlines
+        :return: A dict of ship id to best_intention for the ships whose results came back in time, or None if the
+            turn can't be published and has to be searched in the main process
+        """
+        turn = self.turn + 1
+        buffer = turn % 2
+        self._drain(turn - 2)
+        if not self.publish(game, game_map, buffer):
+            return None
+        self.turn = turn
+        structures = [(dropoff.id, dropoff.position.x, dropoff.position.y) for dropoff in game.me.get_dropoffs()]
+        for index, connection in enumerate(self._connections):
+            tasks = [(ship.id, ship.position.x, ship.position.y, ship.halite_amount, ship.still_count, ship.mission,
+                      None if ship.target_for_search is None else (ship.target_for_search.x, ship.target_for_search.y))
+                     for ship in ships[index::len(self._connections)]]
+            connection.send((self.turn, buffer, structures, len(game_map._ships), tasks, turn_deadline))
+            self._pending[index].append(self.turn)
+
+        intentions = {}
+        gather_deadline = None if turn_deadline is None else turn_deadline + timedelta(seconds=GATHER_GRACE_SECONDS)
+        for index, connection in enumerate(self._connections):
+            while self.turn in self._pending[index]:
+                timeout = None if gather_deadline is None else max(0, (gather_deadline - datetime.now()).total_seconds())
+                if not connection.poll(timeout):
+                    logging.info('search worker missed the deadline, its ships keep their fallbacks')
+                    break
+                turn, results = self._receive(index)
+                # Late results from an earlier turn are dropped
+                if turn == self.turn:
+                    intentions.update(results)
+        return intentions
+
+    def _receive(self, index):
+        """
+        Takes the next results a worker sent back.
+        :param index: The number of the worker
+        :return: A tuple of the turn the results are for and the results
+        """
+        turn, results = self._connections[index].recv()
+        # Workers answer their turns in order
+        self._pending[index].remove(turn)
+        return turn, results
+
+    def _drain(self, turn):
+        """
+        Waits for the workers still searching a turn, so the buffer that turn was published in can be written again.
+        Workers stop at the turn's deadline, so this only waits out the search a worker is in the middle of.
+        :param turn: The turn to wait for
+        :return: nothing.
+        """
+        for index, pending in enumerate(self._pending):
+            if pending and pending[0] <= turn:
+                logging.info('waiting for search worker {} to finish turn {}'.format(index, pending[0]))
+            while pending and pending[0] <= turn:
+                self._receive(index)
+
+    def publish(self, game, game_map, buffer):
+        """
+        Copies this turn's map arrays and ships into shared memory.
+        :param buffer: The number of the buffer to publish into
+        :return: Whether everything fitted
+        """
+        ships = list(game_map._ships.values())
+        ship_table = self.ship_tables[buffer]
+        if len(ships) > len(ship_table):
+            return False
+        for name, _ in SHARED_MAP_ARRAYS:
+            np.copyto(self.map_arrays[buffer][name], getattr(game_map, name), casting='unsafe')
+        for row, ship in enumerate(ships):
+            ship_table[row] = (ship.id, ship.owner, ship.position.x, ship.position.y, ship.halite_amount,
+                               ship.still_count, ship.enemy_takedown_ship)
+        return True
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory.
+        :return: nothing.
+        """
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=0.1)
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+        self._connections = []
+
+
+def _worker_main(connection, game, pool, index):
+    """
+    Runs the searches a worker is sent, on its copy of the game rebuilt from shared memory each turn.
+    :param connection: The worker's end of its pipe to the main process
+    :param game: The worker's copy of the pre-game Game
+    :param pool: The worker's copy of the SearchPool, whose arrays are views onto the shared memory
+    :param index: The number of the worker
+    :return: nothing.
+    """
+    # Only the main process may hold the main ends of the pipes, so a worker sees its pipe close if the bot is killed
+    for main_connection in pool._connections:
+        main_connection.close()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.FileHandler('bot-{}-worker-{}.log'.format(game.my_id, index), mode='w'))
+
+    game_map = game.game_map
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        turn, buffer, structures, ship_count, tasks, turn_deadline = message
+        for name, _ in SHARED_MAP_ARRAYS:
+            setattr(game_map, name, pool.map_arrays[buffer][name])
+        game.me._dropoffs = {dropoff_id: Dropoff(game.me.id, dropoff_id, Position(x, y)) for dropoff_id, x, y in structures}
+        game_map._my_structures = [game.me.shipyard] + game.me.get_dropoffs()
+        game_map._ships = {}
+        for ship_id, owner, x, y, halite_amount, still_count, enemy_takedown_ship in pool.ship_tables[buffer][:ship_count].tolist():
+            ship = Ship(owner, ship_id, Position(x, y), halite_amount)
+            ship.still_count = still_count
+            ship.enemy_takedown_ship = bool(enemy_takedown_ship)
+            game_map._ships[ship_id] = ship
+        game_map.marks_version += 1
+        game.path_cache = PathCache(game_map)
+
+        results = {}
+        for ship_no, (ship_id, x, y, halite_amount, still_count, mission, target) in enumerate(tasks):
+            if turn_deadline is not None and datetime.now() > turn_deadline:
+                break
+            ship = Ship(game.me.id, ship_id, Position(x, y), halite_amount)
+            ship.still_count = still_count
+            ship.mission = mission
+            ship.target_for_search = None if target is None else Position(*target)
+            ship.search_intention(game, game_map, root, share_deadline(turn_deadline, len(tasks) - ship_no))
+            results[ship_id] = ship.best_intention
+        connection.send((turn, results))
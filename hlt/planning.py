@@ -0,0 +1,564 @@
+"""
+Search over the short mining paths a collecting ship considers each turn.
+"""
+import itertools
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from . import constants
+from .positionals import Direction, Position
+
+# A quadrant's paths are made of staying still and moving along its two directions
+QUADRANT_DIRECTIONS = [[Direction.Still, Direction.North, Direction.East],
+                       [Direction.Still, Direction.North, Direction.West],
+                       [Direction.Still, Direction.South, Direction.East],
+                       [Direction.Still, Direction.South, Direction.West]]
+
+# The deepest searches, reached when the turn leaves the time for them
+MINING_SEARCH_SPACE = 6
+BASE_SEARCH_SPACE = 5
+# Enemy move prediction searches paths this many turns long, unless fewer than ENEMY_FULL_SEARCH_SECONDS are left
+# before its deadline, when it drops to the shallowest search that still moves
+ENEMY_SEARCH_SPACE = 4
+ENEMY_SHALLOW_SEARCH_SPACE = 3
+ENEMY_FULL_SEARCH_SECONDS = 0.2
+# Seconds into the turn by which enemy move prediction has to finish, well before the collecting search starts
+ENEMY_PREDICTION_SECONDS = 0.4
+# Seconds into the turn by which every ship has to have finished searching
+SEARCH_SECONDS = 1.6
+# Seconds into the turn by which the collecting ships' mining search has to finish, the other ships search after it
+COLLECTING_SEARCH_SECONDS = 1.0
+# The number of path steps a search plays between looks at the clock
+DEADLINE_CHECK_INTERVAL = 64
+
+# The distinct paths for each search space, see _mining_paths
+_mining_path_tables = {}
+# The order the quadrant loops walk the paths in for each search space, see _mining_path_walk
+_mining_walk_tables = {}
+
+
+def _mining_paths(search_space):
+    """
+    Lists the distinct mining paths, in the order a search looping over the quadrants first meets them.
+    :param search_space: The number of turns in every path
+    :return: A tuple of (paths, x moves, y moves) where the moves are path x turn arrays
+    """
+    if search_space not in _mining_path_tables:
+        paths = {}
+        for directions in QUADRANT_DIRECTIONS:
+            for perm in itertools.product(directions, repeat=search_space - 2):
+                paths[perm + (Direction.Still, Direction.Still)] = None
+        paths = list(paths)
+        moves = np.array(paths, dtype=np.int64)
+        _mining_path_tables[search_space] = (paths, moves[:, :, 0], moves[:, :, 1])
+    return _mining_path_tables[search_space]
+
+
+def _mining_path_walk(search_space):
+    """
+    Lists the paths in the order a search looping over the quadrants walks them, repeats included.
+    :param search_space: The number of turns in every path
+    :return: A list of indexes into the paths of _mining_paths
+    """
+    if search_space not in _mining_walk_tables:
+        index = {path: number for number, path in enumerate(_mining_paths(search_space)[0])}
+        _mining_walk_tables[search_space] = [index[perm + (Direction.Still, Direction.Still)]
+                                             for directions in QUADRANT_DIRECTIONS
+                                             for perm in itertools.product(directions, repeat=search_space - 2)]
+    return _mining_walk_tables[search_space]
+
+
+def share_deadline(turn_deadline, ships_left):
+    """
+    Shares the search time left before a deadline equally between the ships still to search. Ships that finish early
+    leave their time to the ones after them.
+    :param turn_deadline: The time every search has to stop by, or None if there are no deadlines
+    :param ships_left: The number of ships still to search, this one included
+    :return: The time this ship's searches have to stop by, or None if there are no deadlines
+    """
+    if turn_deadline is None:
+        return None
+    now = datetime.now()
+    return now + (turn_deadline - now) / max(ships_left, 1)
+
+
+class TurnScheduler:
+    """
+    Shares the turn's search time between my ships. Every ship is first given a cheap fallback intention, then the
+    path searches run in priority order, so the ships that matter most are searched first and the ones the turn
+    runs out of time for still have a move.
+    """
+    # Search tiers, most urgent first
+    TIERS = ['making_dropoff', 'on_structure', 'other']
+
+    def __init__(self, turn_start_time, use_deadlines=True):
+        """
+        :param turn_start_time: When the turn started
+        :param use_deadlines: Whether to stop searching at SEARCH_SECONDS, off in debug mode
+        """
+        self.turn_deadline = turn_start_time + timedelta(seconds=SEARCH_SECONDS) if use_deadlines else None
+        self.tier_counts = {tier: 0 for tier in self.TIERS}
+        self.tier_counts['fallback'] = 0
+
+    def plan_ships(self, game, game_map, logging, coordinator, command_queue, ships, pool=None):
+        """
+        Gives every ship an intention, searching as many as the turn has time for.
+        :param ships: My ships, in the order their fallback intentions are decided
+        :param pool: A SearchPool to run the searches on, or None to run them here
+        :return: nothing.
+        """
+        to_search = []
+        for ship in ships:
+            logging.info('getting best intention for ship: {}, mission: {}'.format(ship.id, ship.mission))
+            if ship.get_fallback_intention(game, game_map, coordinator, command_queue):
+                to_search.append((self.tier(game, game_map, ship), ship))
+        to_search.sort(key=lambda item: self.TIERS.index(item[0]))
+
+        intentions = None
+        if pool is not None:
+            intentions = pool.search(game, game_map, [ship for _, ship in to_search], self.turn_deadline)
+        if intentions is not None:
+            # Results are applied in priority order whichever worker finished first
+            for tier, ship in to_search:
+                if ship.id in intentions:
+                    ship.best_intention = intentions[ship.id]
+                    self.tier_counts[tier] += 1
+                else:
+                    self.tier_counts['fallback'] += 1
+            logging.info('ships searched per tier: {}'.format(self.tier_counts))
+            return
+
+        for ship_no, (tier, ship) in enumerate(to_search):
+            if self.turn_deadline is not None and datetime.now() > self.turn_deadline:
+                self.tier_counts['fallback'] = len(to_search) - ship_no
+                break
+            ship.search_intention(game, game_map, logging, self.ship_deadline(len(to_search) - ship_no))
+            self.tier_counts[tier] += 1
+        logging.info('ships searched per tier: {}'.format(self.tier_counts))
+
+    def tier(self, game, game_map, ship):
+        """
+        :return: The search tier of the ship
+        """
+        if ship.mission == 'go_to_zone_for_dropoff':
+            return 'making_dropoff'
+        if game_map[ship.position].has_structure:
+            return 'on_structure'
+        return 'other'
+
+    def ship_deadline(self, ships_left):
+        """
+        :param ships_left: The number of ships still to search, this one included
+        :return: The time this ship's searches have to stop by, see share_deadline
+        """
+        return share_deadline(self.turn_deadline, ships_left)
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a search that has run past its deadline.
+    """
+    pass
+
+
+class DeadlineClock:
+    """
+    Tells a search when it has run past its deadline, looking at the clock every DEADLINE_CHECK_INTERVAL steps.
+    """
+    def __init__(self, deadline):
+        """
+        :param deadline: The time to stop by, or None to never stop
+        """
+        self.deadline = deadline
+        self._steps = 0
+
+    def tick(self):
+        """
+        Counts a step of the search.
+        :return: nothing.
+        :raises SearchTimeout: If the deadline has passed
+        """
+        if self.deadline is None:
+            return
+        if self._steps % DEADLINE_CHECK_INTERVAL == 0 and datetime.now() > self.deadline:
+            raise SearchTimeout()
+        self._steps += 1
+
+
+def best_collecting_moves(game, game_map, ships, search_space, logging, deadline=None):
+    """
+    Picks the mining moves of many collecting ships at once.
+
+    Iterative deepening: the shallowest search always finishes, and each deeper one is used if it finishes by the
+    deadline, so the search only gets shallower when the turn is short of time.
+    :param ships: The collecting ships
+    :param search_space: The deepest search, in turns per path
+    :param deadline: The time the deeper searches have to finish by, or None to always search at search_space
+    :return: A dict of ship id to the ship's best_intention
+    """
+    best_moves = {}
+    searching_ships = []
+    for ship in ships:
+        if ship.mines_without_searching(game_map):
+            best_moves[ship.id] = Direction.Still
+        else:
+            searching_ships.append(ship)
+    plans = None
+    for depth in range(search_space if deadline is None else min(3, search_space), search_space + 1):
+        planner = BatchMiningPlanner(game, game_map, searching_ships, depth)
+        depth_plans = planner.plan(deadline if plans is not None else None)
+        if depth_plans is None:
+            logging.info('mining search stopped at search space {}'.format(orig_search_space))
+            break
+        orig_search_space, plans, counts = depth, depth_plans, (planner.expanded.tolist(), planner.pruned.tolist())
+    for ship, plan, expanded, pruned in zip(searching_ships, plans, *counts):
+        logging.info('mining search for ship {} at search space {}: {} path steps played, {} paths pruned'.format(
+            ship.id, orig_search_space, expanded, pruned))
+        best_moves[ship.id] = ship.best_mining_moves(game, game_map, logging, orig_search_space, *plan)
+    return best_moves
+
+
+def predict_enemy_intentions(game, game_map, ships, deadline=None):
+    """
+    Predicts where many collecting enemy ships will move, see BatchEnemyPredictor.
+    :param ships: The enemy ships
+    :param deadline: The time the prediction has to be done by, or None to always search at ENEMY_SEARCH_SPACE
+    :return: A tuple of the set of cells the ships are expected to move to and the search space used
+    """
+    search_space = ENEMY_SEARCH_SPACE
+    if deadline is not None and (deadline - datetime.now()).total_seconds() < ENEMY_FULL_SEARCH_SECONDS:
+        search_space = ENEMY_SHALLOW_SEARCH_SPACE
+    intentions = set()
+    for ship, best_moves in zip(ships, BatchEnemyPredictor(game_map, ships, search_space).plan()):
+        for direction in [best_moves] if type(best_moves) == tuple else best_moves:
+            intentions.add(game_map.normalize(ship.position + Position(*direction)))
+    return intentions, search_space
+
+
+class PathCache:
+    """
+    Per-turn cache of the states ship searches reach along their paths, so a prefix is only walked once however many
+    paths, searches or ships it is shared by. Entries are keyed by (search, start x, start y, cargo bucket, move
+    prefix), where the cargo bucket is whatever part of the cargo the search depends on.
+
+    Searches read ship positions and cell flags, so the cache empties itself whenever either is marked on the map.
+    """
+    def __init__(self, game_map):
+        """
+        :param game_map: The game map the searches run on
+        """
+        self.game_map = game_map
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._marks_version = game_map.marks_version
+
+    def lookup(self, key, step):
+        """
+        :param key: The (search, start x, start y, cargo bucket, move prefix) of the entry
+        :param step: Works the entry out from the state of the prefix one move shorter, on a miss
+        :return: The state the prefix reaches, or None if the path is abandoned along it
+        """
+        if self._marks_version != self.game_map.marks_version:
+            self._entries.clear()
+            self._marks_version = self.game_map.marks_version
+        if key in self._entries:
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        state = self._entries[key] = step()
+        return state
+
+
+class BatchMiningPlanner:
+    """
+    Scores the mining paths of many collecting ships at once: for each quadrant, search_space - 2 moves chosen from
+    staying still or the quadrant's two directions, followed by two turns of mining. A path that fills the ship
+    before its last turn shortens the search to the paths that fill it at least as quickly.
+
+    Every distinct path is played for every ship in lock step, as array gathers on the map, so a turn of all the
+    paths costs a handful of array operations. Within a quadrant a path never returns to a cell it has left, so the
+    halite left in the current cell is a path's only change to the map, and is kept with the path.
+
+    The paths are branched and bounded: after every turn a path is dropped once the most it could still gain, mining
+    the richest cell in reach every turn, can neither fill the ship nor make the ship's top two scores or the best
+    score for its first move. The scores to beat come from the paths that only stay still from there on, whose final
+    score is known as soon as they get there. best_mining_moves picks the same moves from what is left.
+    """
+    def __init__(self, game, game_map, ships, search_space):
+        """
+        :param game: The game
+        :param game_map: The game map, pruning needs its extractable_reach for the turn
+        :param ships: The ships to plan for
+        :param search_space: The number of turns in every path
+        """
+        self.game = game
+        self.game_map = game_map
+        self.ships = ships
+        self.search_space = search_space
+        # The path steps played and paths pruned for every ship
+        self.expanded = np.zeros(len(ships), dtype=np.int64)
+        self.pruned = np.zeros(len(ships), dtype=np.int64)
+
+    def plan(self, deadline=None):
+        """
+        :param deadline: The time to give up by, or None to always finish
+        :return: A list holding, for each ship, a tuple of (search_space, dict_scores, dict_final_positions). If some
+            path fills the ship early, search_space is the fewest turns needed and dict_final_positions maps the paths
+            doing so to where they end. Otherwise search_space is unchanged and dict_scores maps every full path the
+            search kept to the halite it gains, in the order the quadrants are walked. None if the deadline passed first.
+        """
+        if not self.ships:
+            return []
+        game_map = self.game_map
+        paths, path_dx, path_dy = _mining_paths(self.search_space)
+        halite = game_map.adjusted_halite_amount
+        inspiring = game_map.is_inspiring >= constants.INSPIRATION_SHIP_COUNT
+        two_p_dangerous = game_map.flag_mask('two_p_dangerous')
+        enemy_intention = game_map.flag_mask('enemy_intention')
+        my_structure = np.zeros(halite.shape, dtype=bool)
+        for entity in self.game.me.get_dropoffs_and_shipyard():
+            my_structure[entity.position.y, entity.position.x] = True
+        enemy_takedown = np.zeros(halite.shape, dtype=bool)
+        friendly_blocker = np.zeros(halite.shape, dtype=bool)
+        for y, x in zip(*np.nonzero(game_map.ship_id >= 0)):
+            ship = game_map[Position(int(x), int(y))].ship
+            if ship.owner == self.game.me.id:
+                friendly_blocker[y, x] = ship.halite_amount < 700
+            else:
+                enemy_takedown[y, x] = ship.enemy_takedown_ship
+
+        start_x = np.array([ship.position.x for ship in self.ships], dtype=np.int64)
+        start_y = np.array([ship.position.y for ship in self.ships], dtype=np.int64)
+        cargo = np.array([ship.halite_amount for ship in self.ships], dtype=np.float64)
+        impatient = np.array([ship.still_count < 6 for ship in self.ships])
+        # The (ship, path) pairs still being played, ordered by ship then path, and where each has got to
+        pair_ship = np.repeat(np.arange(len(self.ships)), len(paths))
+        pair_path = np.tile(np.arange(len(paths)), len(self.ships))
+        x = start_x[pair_ship]
+        y = start_y[pair_ship]
+        halite_counter = cargo[pair_ship]
+        cell_halite = halite[y, x]
+        # ship x path arrays of the turn every path fills the ship on, if it does, and where
+        shape = (len(self.ships), len(paths))
+        hit_turn = np.full(shape, self.search_space, dtype=np.int64)
+        hit_x = np.zeros(shape, dtype=np.int64)
+        hit_y = np.zeros(shape, dtype=np.int64)
+        bounds = _MiningBounds(self, paths, path_dx, path_dy, inspiring, enemy_takedown, cargo)
+
+        for iter in range(self.search_space):
+            if deadline is not None and datetime.now() > deadline:
+                return None
+            self.expanded += np.bincount(pair_ship, minlength=len(self.ships))
+            dx = path_dx[pair_path, iter]
+            dy = path_dy[pair_path, iter]
+            still = (dx == 0) & (dy == 0)
+
+            cell_inspiring = inspiring[y, x]
+            mined_counter = halite_counter + np.where(cell_inspiring, cell_halite * 0.75, cell_halite * 0.25)
+            mined_halite = np.where(cell_inspiring, cell_halite, 0.75 * cell_halite)
+            next_x = (x + dx) % game_map.width
+            next_y = (y + dy) % game_map.height
+            next_halite = halite[next_y, next_x]
+            moved_counter = halite_counter - next_halite * 0.1
+            abandoned = ~still & ((halite_counter < cell_halite * 0.1)
+                                  | my_structure[next_y, next_x]
+                                  | (two_p_dangerous[next_y, next_x] & (moved_counter > 500) & (iter > 0)))
+
+            x = np.where(still, x, next_x)
+            y = np.where(still, y, next_y)
+            halite_counter = np.where(still, mined_counter, moved_counter)
+            cell_halite = np.where(still, mined_halite, next_halite)
+            halite_counter = np.where(enemy_takedown[y, x] & (halite_counter < 300), halite_counter + 500, halite_counter)
+            if iter == 0:
+                abandoned |= friendly_blocker[y, x] & ((x != start_x[pair_ship]) | (y != start_y[pair_ship]))
+                abandoned |= enemy_intention[y, x] & impatient[pair_ship]
+
+            hit = ~abandoned & (halite_counter >= constants.MAX_HALITE)
+            hit_turn[pair_ship[hit], pair_path[hit]] = iter
+            hit_x[pair_ship[hit], pair_path[hit]] = x[hit]
+            hit_y[pair_ship[hit], pair_path[hit]] = y[hit]
+            # A path filling the ship on its last turn is still scored
+            playing = ~abandoned
+            if iter + 1 < self.search_space:
+                playing &= ~hit
+                hopeless = bounds.hopeless(iter, playing, pair_ship, pair_path, x, y, halite_counter, cell_halite)
+                self.pruned += np.bincount(pair_ship[hopeless], minlength=len(self.ships))
+                playing &= ~hopeless
+            pair_ship, pair_path = pair_ship[playing], pair_path[playing]
+            x, y, halite_counter, cell_halite = x[playing], y[playing], halite_counter[playing], cell_halite[playing]
+
+        plans = []
+        ends = np.searchsorted(pair_ship, np.arange(len(self.ships) + 1))
+        for index, ship in enumerate(self.ships):
+            search_space = min(self.search_space, int(hit_turn[index].min()) + 1)
+            if search_space < self.search_space:
+                final_positions = {}
+                for path in np.flatnonzero(hit_turn[index] == search_space - 1).tolist():
+                    final_positions[paths[path][:search_space]] = Position(int(hit_x[index, path]), int(hit_y[index, path]))
+                plans.append((search_space, {}, final_positions))
+            else:
+                kept = slice(ends[index], ends[index + 1])
+                scores = (halite_counter[kept] - cargo[index]).tolist()
+                plans.append((search_space, dict(zip([paths[path] for path in pair_path[kept].tolist()], scores)), {}))
+        return plans
+
+
+class _MiningBounds:
+    """
+    Keeps the scores BatchMiningPlanner has to beat for every ship and tells which paths can't beat them.
+    """
+    def __init__(self, planner, paths, path_dx, path_dy, inspiring, enemy_takedown, cargo):
+        """
+        :param planner: The BatchMiningPlanner
+        :param paths: The paths, see _mining_paths
+        :param inspiring: Whether mining every cell is inspired
+        :param enemy_takedown: Whether every cell holds an enemy ship to take down
+        :param cargo: An array of the cargo of every ship
+        """
+        self.search_space = planner.search_space
+        reach = planner.game_map.extractable_reach
+        # turn x cell, the most a path can still gain after the turn: j turns on it can mine no further than j cells
+        # away, nor further than its moves left
+        self.gain_bound = None if reach is None else \
+            [sum(reach[min(turn, max(0, self.search_space - iter - 3))] for turn in range(self.search_space - iter - 1))
+             for iter in range(self.search_space - 1)]
+        self.inspiring = inspiring
+        self.enemy_takedown = enemy_takedown
+        self.cargo = cargo
+        _, self.first_move = np.unique(path_dx[:, 0] * 3 + path_dy[:, 0], return_inverse=True)
+        # turn x path, whether the path makes its last move on the turn, so its score is known from there on
+        moves = (path_dx != 0) | (path_dy != 0)
+        still_after = np.array([~moves[:, iter + 1:].any(axis=1) for iter in range(self.search_space)])
+        self.settles = still_after & ~np.vstack([np.zeros(len(paths), dtype=bool), still_after[:-1]])
+        # ship x first move array of the best score known for a path starting with that move
+        self.best = np.full((len(cargo), self.first_move.max() + 1), float('-inf'))
+
+    def hopeless(self, iter, playing, pair_ship, pair_path, x, y, halite_counter, cell_halite):
+        """
+        Learns the final scores of the paths that only stay still from here, then bounds every path still playing.
+        :param iter: The turn just played
+        :param playing: Whether each pair is still being played
+        :return: Whether each pair can't fill the ship, make its ship's top two scores or beat the best for its first move
+        """
+        hopeless = np.zeros(len(pair_ship), dtype=bool)
+        if self.gain_bound is None or iter >= self.search_space - 2:
+            return hopeless
+        known = np.flatnonzero(playing & self.settles[iter, pair_path])
+        counter = halite_counter[known]
+        left = cell_halite[known]
+        inspired = self.inspiring[y[known], x[known]]
+        takedown = self.enemy_takedown[y[known], x[known]]
+        extract_ratio = np.where(inspired, 0.75, 0.25)
+        left_ratio = np.where(inspired, 1.0, 0.75)
+        for _ in range(self.search_space - iter - 1):
+            counter = counter + left * extract_ratio
+            left = left * left_ratio
+            if takedown.any():
+                counter = np.where(takedown & (counter < 300), counter + 500, counter)
+        np.maximum.at(self.best, (pair_ship[known], self.first_move[pair_path[known]]), counter - self.cargo[pair_ship[known]])
+        # Bounds reaching over the first two turns are too loose to prune much, and checks on the last only save a turn
+        if iter < 2:
+            return hopeless
+        # The second best first move stands in for the second best score, it is never higher. Mining the same halite
+        # in a different order can round differently, so the bound is only trusted past that
+        second_best = np.sort(self.best, axis=1)[:, -2]
+        to_beat = np.minimum(np.minimum(self.best, second_best[:, None]) + self.cargo[:, None] - 1e-6, constants.MAX_HALITE)
+        hopeless = playing & (halite_counter + self.gain_bound[iter][y, x] < to_beat[pair_ship, self.first_move[pair_path]])
+        return hopeless
+
+
+class BatchEnemyPredictor:
+    """
+    Predicts the moves of many collecting enemy ships at once, as the best first moves of the mining paths of
+    _mining_paths, scored by the halite they gain.
+
+    Enemies mine without inspiration and never move onto an occupied cell. Every path is played for every ship in
+    lock step as in BatchMiningPlanner. Once a path fills the ship, the paths walked after it are cut to its length and
+    only those are ranked, so the results are read back by replaying that walk over the arrays.
+    """
+    def __init__(self, game_map, ships, search_space=ENEMY_SEARCH_SPACE):
+        """
+        :param game_map: The game map
+        :param ships: The enemy ships
+        :param search_space: The number of turns in every path
+        """
+        self.game_map = game_map
+        self.ships = ships
+        self.search_space = search_space
+
+    def plan(self):
+        """
+        :return: A list holding, for each ship, its best move or a list of its best two
+        """
+        if not self.ships:
+            return []
+        game_map = self.game_map
+        paths, path_dx, path_dy = _mining_paths(self.search_space)
+        halite = game_map.adjusted_halite_amount
+        occupied = game_map.ship_id >= 0
+
+        shape = (len(self.ships), len(paths))
+        start_x = np.array([ship.position.x for ship in self.ships], dtype=np.int64)[:, None]
+        start_y = np.array([ship.position.y for ship in self.ships], dtype=np.int64)[:, None]
+        cargo = np.array([ship.halite_amount for ship in self.ships], dtype=np.float64)[:, None]
+        x = np.repeat(start_x, shape[1], axis=1)
+        y = np.repeat(start_y, shape[1], axis=1)
+        halite_counter = np.repeat(cargo, shape[1], axis=1)
+        cell_halite = halite[y, x]
+        alive = np.ones(shape, dtype=bool)
+        hit_turn = np.full(shape, self.search_space, dtype=np.int64)
+        # turn x ship x path arrays of the cargo after each turn, and whether the path still stands then
+        counters = np.empty((self.search_space,) + shape)
+        standing = np.empty((self.search_space,) + shape, dtype=bool)
+
+        for iter in range(self.search_space):
+            dx = path_dx[:, iter]
+            dy = path_dy[:, iter]
+            still = (dx == 0) & (dy == 0)
+            active = alive & (hit_turn == self.search_space)
+
+            mined_counter = halite_counter + cell_halite * 0.25
+            next_x = (x + dx) % game_map.width
+            next_y = (y + dy) % game_map.height
+            next_halite = halite[next_y, next_x]
+            abandoned = ~still & (halite_counter < cell_halite * 0.1)
+
+            halite_counter = np.where(still, mined_counter, halite_counter - next_halite * 0.1)
+            cell_halite = np.where(still, 0.75 * cell_halite, next_halite)
+            x = np.where(still, x, next_x)
+            y = np.where(still, y, next_y)
+            abandoned |= occupied[y, x] & ((x != start_x) | (y != start_y))
+
+            alive &= ~(active & abandoned)
+            hit_turn[active & ~abandoned & (halite_counter >= constants.MAX_HALITE)] = iter
+            counters[iter] = halite_counter
+            standing[iter] = alive
+
+        walk = _mining_path_walk(self.search_space)
+        cell_halite_now = game_map.halite_amount
+        plans = []
+        for index, ship in enumerate(self.ships):
+            here = cell_halite_now.item(ship.position.y, ship.position.x)
+            if ship.halite_amount < here * 0.1 or here * 0.25 + ship.halite_amount >= constants.MAX_HALITE:
+                plans.append(Direction.Still)
+                continue
+            # Paths are cut to the turn the first ship-filling path fills on, and only the paths walked from that one
+            # on are scored at that length
+            search_space = min(self.search_space, int(hit_turn[index].min()) + 1)
+            first = 0
+            if search_space < self.search_space:
+                first = next(step for step, path in enumerate(walk) if hit_turn[index, path] == search_space - 1)
+            scores = {}
+            for path in walk[first:]:
+                if standing[search_space - 1, index, path]:
+                    scores.setdefault(paths[path][:search_space], counters[search_space - 1, index, path] - ship.halite_amount)
+            ordered_top_dirs = []
+            for item in sorted(scores, key=scores.get, reverse=True):
+                if item[0] not in ordered_top_dirs:
+                    ordered_top_dirs.append(item[0])
+                if len(ordered_top_dirs) == 2:
+                    break
+            plans.append(ordered_top_dirs[0] if len(ordered_top_dirs) == 1 else ordered_top_dirs)
+        return plans
@@ -71,10 +71,39 @@ class Direction:
             raise IndexError
 
 
+# Shared Position instances for every on-map coordinate, indexed [y][x], see Position.build_pool
+_pool = []
+
+
 class Position:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
+    """
+    A coordinate on the map. Positions are treated as immutable: every on-map coordinate is shared from a
+    pool built once the map size is known, so normalizing and offsetting hand back existing objects.
+    """
+    __slots__ = ('x', 'y')
+
+    def __new__(cls, x, y):
+        if x >= 0 and y >= 0:
+            try:
+                return _pool[y][x]
+            except (IndexError, TypeError):
+                pass
+        position = object.__new__(cls)
+        position.x = x
+        position.y = y
+        return position
+
+    def __getnewargs__(self):
+        return self.x, self.y
+
+    @staticmethod
+    def build_pool(width, height):
+        """
+        Creates the shared instances for every coordinate of a width x height map.
+        """
+        global _pool
+        _pool = []
+        _pool = [[Position(x, y) for x in range(width)] for y in range(height)]
 
     def directional_offset(self, direction):
         """
@@ -82,7 +111,7 @@ class Position:
         :param direction: the direction cardinal tuple
         :return: a new position moved in that direction
         """
-        return self + Position(*direction)
+        return Position(self.x + direction[0], self.y + direction[1])
 
     def get_surrounding_cardinals(self):
         """
@@ -101,14 +130,10 @@ class Position:
         return Position(self.x - other.x, self.y - other.y)
 
     def __iadd__(self, other):
-        self.x += other.x
-        self.y += other.y
-        return self
+        return Position(self.x + other.x, self.y + other.y)
 
     def __isub__(self, other):
-        self.x -= other.x
-        self.y -= other.y
-        return self
+        return Position(self.x - other.x, self.y - other.y)
 
     def __abs__(self):
         return Position(abs(self.x), abs(self.y))
@@ -0,0 +1,275 @@
+"""
+Turns my ships' intentions into moves that don't run my ships into each other.
+"""
+import logging
+
+from .positionals import Direction, Position
+
+
+class MoveResolver:
+    """
+    Picks a move for every ship still without a command, all at once.
+
+    Each ship ranks the cells it would move to: its intention, its second choice if it has one, and staying still
+    as the last resort. A ship may take a cell another of my ships is leaving, so chains and cycles of ships move
+    together.
+
+    The ships' first choices are followed as a graph of which ship wants to move into which ship's cell. A ship
+    whose first choice nobody else can take gets it once the ship on that cell has left, so chains are resolved
+    from their heads and cycles are rotated whole. The ships left over, wanting the same cells or waiting on ships
+    that stay, are given the collision-free assignment with the lowest total rank, and among those the one that
+    serves the earlier ships better, as the ships are listed. A ship only stays still against its wishes when
+    nothing better can be found for it.
+    """
+    def __init__(self, game, game_map):
+        """
+        :param game: The game
+        :param game_map: The game map, with every ship marked on its cell
+        """
+        self.game = game
+        self.game_map = game_map
+        self._home_positions = [entity.position for entity in game.me.get_dropoffs() + [game.me.shipyard]]
+
+    def resolve(self, ships, command_queue):
+        """
+        Sends a move for every ship in the list without a command yet, and marks the cells they move to.
+        :param ships: My ships, the earlier ones being served first when the total rank is tied
+        :param command_queue: The commands of the turn, the moves are appended
+        :return: nothing.
+        """
+        ships = [ship for ship in ships if not ship.command_sent]
+        resolving = {ship.id for ship in ships}
+        candidates = [self._candidates(ship, resolving) for ship in ships]
+        cells = [(ship.position.x, ship.position.y) for ship in ships]
+
+        choices = self._follow_first_choices(candidates, cells)
+        in_conflict = [index for index, choice in enumerate(choices) if choice is None]
+        for index, choice in self._assign(candidates, in_conflict, len(ships)).items():
+            choices[index] = choice
+        moves = [options[choice] for options, choice in zip(candidates, choices)]
+        self._send(ships, moves, cells, command_queue)
+        ranks = [0, 0, 0]
+        for _, _, rank in moves:
+            ranks[rank] += 1
+        logging.info('resolved {} ships: {} first choice, {} second choice, {} held still, {} in conflict'.format(
+            len(ships), ranks[0], ranks[1], ranks[2], len(in_conflict)))
+
+    @staticmethod
+    def _follow_first_choices(candidates, cells):
+        """
+        Gives the ships their first choice wherever no other ship can take that cell, in the order the ships on those
+        cells move out of the way.
+        :param candidates: The candidates of every ship, see _candidates
+        :param cells: The (x, y) of every ship
+        :return: A list of the index of every ship's chosen candidate, None for the ships still to be assigned
+        """
+        # A ship's own cell only stops another ship taking it if the ship stays, which is decided below
+        claims = {}
+        for index, options in enumerate(candidates):
+            for _, cell, _ in options:
+                if cell is not None and cell != cells[index]:
+                    claims.setdefault(cell, []).append(index)
+        ship_at = {cell: index for index, cell in enumerate(cells)}
+
+        choices = [None] * len(candidates)
+        leaving = []
+        waiting_on = {}
+        for index, options in enumerate(candidates):
+            direction, cell, _ = options[0]
+            if cell is None:
+                choices[index] = 0
+                leaving.append(index)
+            elif direction == Direction.Still:
+                if cell not in claims:
+                    choices[index] = 0
+            elif claims[cell] == [index]:
+                if cell in ship_at:
+                    waiting_on[index] = ship_at[cell]
+                else:
+                    choices[index] = 0
+                    leaving.append(index)
+        if not waiting_on:
+            return choices
+
+        # Chains, in topological order from the ships moving into free cells
+        waiting_for = {leader: index for index, leader in waiting_on.items()}
+        while leaving:
+            index = waiting_for.pop(leaving.pop(), None)
+            if index is not None:
+                choices[index] = 0
+                leaving.append(index)
+
+        # Cycles, where every ship waits on the next
+        for start in waiting_on:
+            cycle = [start]
+            while choices[cycle[-1]] is None and cycle[-1] in waiting_on and waiting_on[cycle[-1]] not in cycle:
+                cycle.append(waiting_on[cycle[-1]])
+            if choices[cycle[-1]] is None and waiting_on.get(cycle[-1]) == start:
+                for index in cycle:
+                    choices[index] = 0
+        return choices
+
+    def _send(self, ships, moves, cells, command_queue):
+        """
+        Sends the chosen moves, the ships leaving a cell before the ship moving into it, and marks their new cells.
+        Logs the chains and cycles the ships move in.
+        :param moves: The chosen (direction, cell, rank) of every ship
+        :param cells: The (x, y) of every ship
+        :return: nothing.
+        """
+        game_map = self.game_map
+        ship_at = {cell: index for index, cell in enumerate(cells)}
+        targets = {}
+        leaders = {}
+        followers = {}
+        for index, (ship, (direction, _, _)) in enumerate(zip(ships, moves)):
+            if direction == Direction.Still:
+                command_queue.append(ship.stay_still())
+                ship.command_sent = True
+                continue
+            targets[index] = game_map.normalize(ship.position + Position(*direction))
+            leader = ship_at.get((targets[index].x, targets[index].y))
+            if leader is not None and moves[leader][0] != Direction.Still:
+                leaders[index] = leader
+                followers.setdefault(leader, []).append(index)
+
+        def send(group):
+            """
+            Sends ships that leave their cells together, then the ships following them wave by wave.
+            :return: All the ships sent
+            """
+            sent = []
+            while group:
+                for index in group:
+                    game_map[ships[index].position].mark_safe()
+                for index in group:
+                    command_queue.append(ships[index].move(moves[index][0]))
+                    ships[index].command_sent = True
+                    game_map[targets[index]].mark_unsafe(ships[index])
+                sent += group
+                group = [follower for index in group for follower in followers.get(index, [])
+                         if not ships[follower].command_sent]
+            return sent
+
+        chains = []
+        for index in targets:
+            if index not in leaders:
+                group = send([index])
+                if len(group) > 1:
+                    chains.append(group)
+        cycles = []
+        for start in targets:
+            if ships[start].command_sent:
+                continue
+            # No chain head leads here, so following the leaders comes round a cycle
+            path = [start]
+            while leaders[path[-1]] not in path:
+                path.append(leaders[path[-1]])
+            cycles.append(send(path[path.index(leaders[path[-1]]):]))
+
+        near_structures = sum(1 for group in chains + cycles for index in group
+                              if game_map[ships[index].position].close_to_my_dropoff)
+        logging.info('move graph: {} chains of {} ships, longest {}, {} cycles of {} ships, {} of them by my structures'.format(
+            len(chains), sum(len(group) for group in chains), max([len(group) for group in chains], default=0),
+            len(cycles), sum(len(group) for group in cycles), near_structures))
+
+    def _candidates(self, ship, resolving):
+        """
+        Lists the moves a ship would make, best first, that don't run into an enemy it shouldn't or a ship of mine
+        that stays put. Staying still is always the last resort.
+        :param resolving: The ids of the ships being resolved, whose cells may be vacated
+        :return: A list of (direction, cell, rank) where cell is the (x, y) the move takes up, or None if any number
+            of ships may end there, and rank is 0 for the ship's first choice, 1 for its second and 2 for the last resort
+        """
+        intentions = ship.best_intention if type(ship.best_intention) is list else [ship.best_intention]
+        options = []
+        for rank, direction in enumerate(intentions[:2]):
+            if direction in [option[0] for option in options]:
+                continue
+            if direction == Direction.Still:
+                options.append((direction, (ship.position.x, ship.position.y), rank))
+                continue
+            allowed, cell = self._allowed(ship, self.game_map.normalize(ship.position + Position(*direction)), resolving)
+            if allowed:
+                options.append((direction, cell, rank))
+        if Direction.Still not in [option[0] for option in options]:
+            options.append((Direction.Still, (ship.position.x, ship.position.y), 2))
+        return options
+
+    def _allowed(self, ship, position, resolving):
+        """
+        Tells whether the ship may move onto a cell. A free cell is allowed unless an enemy means to move there,
+        which only a ship kept still for over 6 turns ignores, and the cells of the ships being resolved count as
+        free. An enemy's cell is allowed if the enemy is a passive takedown, or in a 2p game worth taking down. A
+        ship on its final return may move onto my structures whoever is there, and my other ships' cells are never
+        allowed.
+        :return: A tuple of whether the ship may move to the position, and the cell it would take up
+        """
+        mapcell = self.game_map[position]
+        occupant = mapcell.ship
+        cell = (position.x, position.y)
+        if ship.mission == 'final_base_return' and position in self._home_positions:
+            # Ships crash into the structures together at the end of the game
+            return True, None
+        if occupant is None or occupant.id in resolving:
+            return not mapcell.enemy_intention or ship.still_count > 6, cell
+        if occupant.owner != self.game.me.id:
+            takedown = mapcell.enemy_passive_takedown or (len(self.game.players) == 2 and occupant.enemy_takedown_ship)
+            return takedown, cell
+        return False, cell
+
+    @staticmethod
+    def _assign(candidates, in_conflict, ship_count):
+        """
+        Finds the lowest cost assignment of the ships in conflict to their candidate cells, adding one ship at a time
+        along the cheapest chain of ships giving up their cells to the next one.
+        :param candidates: The candidates of every ship, see _candidates
+        :param in_conflict: The indexes of the ships to assign
+        :param ship_count: The number of ships, which sets the weight of a ship's place in the list
+        :return: A dict of ship index to the index of its chosen candidate
+        """
+        # A worse choice always costs more than any reordering of who gets served first
+        rank_cost = 2 * ship_count * ship_count + 1
+
+        def cost(index, choice):
+            rank = candidates[index][choice][2]
+            return rank * rank_cost + rank * (ship_count - index)
+
+        choices = {}
+        holders = {}
+        for start in in_conflict:
+            # Bellman-Ford over the chains: a ship takes a cell, whose holder moves on to another of its cells
+            distance = {start: 0}
+            previous = {}
+            best_end = None
+            queue = [start]
+            while queue:
+                index = queue.pop(0)
+                held = cost(index, choices[index]) if index in choices else 0
+                for choice, (_, cell, _) in enumerate(candidates[index]):
+                    if index in choices and choice == choices[index]:
+                        continue
+                    reached = distance[index] + cost(index, choice) - held
+                    holder = holders.get(cell) if cell is not None else None
+                    if holder is None:
+                        if best_end is None or reached < best_end[0]:
+                            best_end = (reached, index, choice)
+                    elif reached < distance.get(holder, reached + 1) and holder != start:
+                        distance[holder] = reached
+                        previous[holder] = (index, choice)
+                        if holder not in queue:
+                            queue.append(holder)
+            _, index, choice = best_end
+            while True:
+                cell = candidates[index][choice][1]
+                if index in choices:
+                    old_cell = candidates[index][choices[index]][1]
+                    if holders.get(old_cell) == index:
+                        del holders[old_cell]
+                choices[index] = choice
+                if cell is not None:
+                    holders[cell] = index
+                if index == start:
+                    break
+                index, choice = previous[index]
+        return choices
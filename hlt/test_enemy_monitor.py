@@ -0,0 +1,176 @@
+import itertools
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+from hlt import constants
+
+constants.load_constants({
+    'NEW_ENTITY_ENERGY_COST': 1000, 'DROPOFF_COST': 4000, 'MAX_ENERGY': 1000, 'MAX_TURNS': 400,
+    'EXTRACT_RATIO': 4, 'MOVE_COST_RATIO': 10, 'INSPIRATION_ENABLED': True, 'INSPIRATION_RADIUS': 4,
+    'INSPIRATION_SHIP_COUNT': 2, 'INSPIRED_EXTRACT_RATIO': 4, 'INSPIRED_BONUS_MULTIPLIER': 2.0,
+    'INSPIRED_MOVE_COST_RATIO': 10})
+
+from hlt.enemy_monitor import EnemyMonitor
+from hlt.entity import Ship, Shipyard
+from hlt.game_map import GameMap, Player
+from hlt.influence import DiamondSumIndex
+from hlt.planning import BatchEnemyPredictor
+from hlt.positionals import Direction, Position
+
+
+def make_game(seed, players, size=32, ship_count=120):
+    rnd = random.Random(seed)
+    halite = np.array([[rnd.randint(0, 1000) for _ in range(size)] for _ in range(size)], dtype=np.int64)
+    game_map = GameMap(halite, size, size)
+    game = SimpleNamespace(game_map=game_map, players={})
+    for player_id in range(players):
+        shipyard = Shipyard(player_id, -1, Position(rnd.randrange(size), rnd.randrange(size)))
+        game.players[player_id] = Player(player_id, shipyard)
+    game.me = game.players[0]
+    game_map._update_structure_distances([game.me.shipyard], [player.shipyard for player in game.players.values()], 10)
+    for ship_id in range(ship_count):
+        position = Position(rnd.randrange(size), rnd.randrange(size))
+        if game_map[position].is_occupied:
+            continue
+        ship = Ship(rnd.randrange(players), ship_id, position, rnd.choice([1000, rnd.randint(0, 1000)]))
+        ship.still_count = rnd.randint(0, 6)
+        game.players[ship.owner]._ships[ship.id] = ship
+        game_map[position].mark_unsafe(ship)
+    game_map.ship_index = DiamondSumIndex(game_map.ship_id >= 0, 4)
+    game_map.my_ship_index = DiamondSumIndex(game_map.ship_owner == game.me.id, 4)
+    return game
+
+
+def reference_threats(game, ships):
+    """
+    Works out the threats one ship at a time, straight from their definitions.
+    :return: A dict of ship id to its threat attributes, and the sets of passive takedown and dangerous cells
+    """
+    game_map = game.game_map
+    attributes = {}
+    passive_cells = set()
+    dangerous_cells = set()
+    for ship in ships:
+        if len(game.players) == 2:
+            inspired = game_map.my_ship_index.sum_within(ship.position, constants.INSPIRATION_RADIUS) \
+                >= constants.INSPIRATION_SHIP_COUNT
+            mined = game_map[ship.position].halite_amount * (0.75 if inspired else 0.25)
+            expected_value = min(1000, ship.halite_amount + mined)
+            my_count = game_map.my_ship_index.sum_within(ship.position, 4)
+            enemy_count = game_map.ship_index.sum_within(ship.position, 4) - my_count
+            attributes[ship.id] = (inspired, expected_value, min(1000 - ship.halite_amount, mined),
+                                   expected_value > 500 and (my_count >= 2 or enemy_count <= 1))
+        if ship.halite_amount == 1000 and ship.still_count > 3:
+            passive_cells.add(ship.position)
+        for position in ship.position.get_surrounding_cardinals():
+            position = game_map.normalize(position)
+            if all(game_map.calculate_distance(position, entity.position) > 4
+                   for entity in game.me.get_dropoffs_and_shipyard()):
+                dangerous_cells.add(position)
+    return attributes, passive_cells, dangerous_cells
+
+
+def test_update_threats_matches_per_ship_reference():
+    for seed in range(10):
+        for players in (2, 4):
+            game = make_game(seed, players)
+            game_map = game.game_map
+            ships = [ship for player in game.players.values() if player.id != game.me.id for ship in player.get_ships()]
+            attributes, passive_cells, dangerous_cells = reference_threats(game, ships)
+
+            xs = np.array([ship.position.x for ship in ships], dtype=np.int64)
+            ys = np.array([ship.position.y for ship in ships], dtype=np.int64)
+            cargo = np.array([ship.halite_amount for ship in ships], dtype=np.int64)
+            still = np.array([ship.still_count for ship in ships], dtype=np.int64)
+            EnemyMonitor(game).update_threats(game, game_map, ships, xs, ys, cargo, still)
+
+            for ship in ships:
+                if players == 2:
+                    assert (ship.enemy_inspired, ship.enemy_expected_value_if_still, ship.enemy_still_to_gain,
+                            ship.enemy_takedown_ship) == attributes[ship.id]
+                assert ship.enemy_takedown_ship_passive == (ship.position in passive_cells)
+            for y in range(game_map.height):
+                for x in range(game_map.width):
+                    cell = game_map[Position(x, y)]
+                    assert cell.enemy_passive_takedown == (cell.position in passive_cells)
+                    assert cell.two_p_dangerous == (cell.position in dangerous_cells)
+
+
+def test_sums_within_matches_sum_within():
+    rnd = random.Random(0)
+    grid = np.array([[rnd.randint(0, 5) for _ in range(24)] for _ in range(20)], dtype=np.int64)
+    index = DiamondSumIndex(grid, 4)
+    xs = np.array([rnd.randrange(24) for _ in range(50)], dtype=np.int64)
+    ys = np.array([rnd.randrange(20) for _ in range(50)], dtype=np.int64)
+    for radius in range(5):
+        expected = [index.sum_within(Position(x, y), radius) for x, y in zip(xs.tolist(), ys.tolist())]
+        assert index.sums_within(xs, ys, radius).tolist() == expected
+
+
+def reference_prediction(game_map, ship, search_space):
+    """
+    Searches one enemy ship's mining paths one at a time, shortening the paths once one fills the ship.
+    :return: The ship's best move or a list of its best two
+    """
+    here = game_map[ship.position]
+    if ship.halite_amount < here.halite_amount * 0.1 or here.halite_amount * 0.25 + ship.halite_amount >= 1000:
+        return Direction.Still
+    repeat = search_space - 2
+    dict_scores = {}
+    for core_directions in [[Direction.Still, Direction.North, Direction.East],
+                            [Direction.Still, Direction.North, Direction.West],
+                            [Direction.Still, Direction.South, Direction.East],
+                            [Direction.Still, Direction.South, Direction.West]]:
+        for perm in itertools.product(core_directions, repeat=repeat):
+            perm = perm + (Direction.Still, Direction.Still)
+            x, y, halite_counter, cell_halite = ship.position.x, ship.position.y, ship.halite_amount, here.adjusted_halite_amount
+            standing = True
+            for iter in range(search_space):
+                direction = perm[iter]
+                if direction == Direction.Still:
+                    halite_counter += cell_halite * 0.25
+                    cell_halite = 0.75 * cell_halite
+                elif halite_counter < cell_halite * 0.1:
+                    standing = False
+                    break
+                else:
+                    x, y = (x + direction[0]) % game_map.width, (y + direction[1]) % game_map.height
+                    cell_halite = game_map[Position(x, y)].adjusted_halite_amount
+                    halite_counter -= cell_halite * 0.1
+                if game_map[Position(x, y)].is_occupied and (x, y) != (ship.position.x, ship.position.y):
+                    standing = False
+                    break
+                if halite_counter >= 1000:
+                    search_space = min(search_space, iter + 1)
+                    dict_scores[perm[:search_space]] = halite_counter - ship.halite_amount
+                    standing = False
+                    break
+            if standing:
+                dict_scores[perm[:search_space]] = halite_counter - ship.halite_amount
+    dict_scores = {key: dict_scores[key] for key in dict_scores if len(key) == search_space}
+    ordered_top_dirs = []
+    for item in sorted(dict_scores, key=dict_scores.get, reverse=True):
+        if item[0] not in ordered_top_dirs:
+            ordered_top_dirs.append(item[0])
+        if len(ordered_top_dirs) == 2:
+            break
+    return ordered_top_dirs[0] if len(ordered_top_dirs) == 1 else ordered_top_dirs
+
+
+def test_batched_enemy_prediction_matches_per_ship_search():
+    for seed in range(20):
+        game = make_game(seed, 4, ship_count=60 if seed % 2 else 150)
+        game_map = game.game_map
+        if seed % 3 == 0:
+            # Mined out cells, so some ships fill up before their paths end
+            game_map.adjusted_halite_amount[...] = game_map.adjusted_halite_amount * np.random.RandomState(seed).uniform(
+                0.3, 1, game_map.adjusted_halite_amount.shape)
+        ships = [ship for player in game.players.values() if player.id != game.me.id for ship in player.get_ships()]
+        if seed % 5 == 0:
+            for ship in ships:
+                ship.halite_amount = 900 + ship.halite_amount % 100
+        for search_space in (3, 4):
+            expected = [reference_prediction(game_map, ship, search_space) for ship in ships]
+            assert BatchEnemyPredictor(game_map, ships, search_space).plan() == expected
@@ -0,0 +1,93 @@
+import itertools
+import random
+
+from hlt.positionals import Direction
+from hlt.resolver import MoveResolver
+
+
+def resolve(candidates, cells):
+    """
+    Runs both stages of MoveResolver on ready made candidates.
+    :return: A list of the index of every ship's chosen candidate
+    """
+    choices = MoveResolver._follow_first_choices(candidates, cells)
+    in_conflict = [index for index, choice in enumerate(choices) if choice is None]
+    for index, choice in MoveResolver._assign(candidates, in_conflict, len(candidates)).items():
+        choices[index] = choice
+    return choices
+
+
+def collision_free(candidates, choices):
+    cells = [candidates[index][choice][1] for index, choice in enumerate(choices)]
+    taken = [cell for cell in cells if cell is not None]
+    return len(taken) == len(set(taken))
+
+
+def total_rank(candidates, choices):
+    return sum(candidates[index][choice][2] for index, choice in enumerate(choices))
+
+
+def random_candidates(rnd, ship_count):
+    """
+    Places ships on a 3 x 3 patch and gives each one or two wishes, some of them ruled out, then staying still.
+    :return: The candidates and cells of the ships, as MoveResolver makes them
+    """
+    cells = rnd.sample([(x, y) for x in range(3) for y in range(3)], ship_count)
+    candidates = []
+    for x, y in cells:
+        options = []
+        for rank, direction in enumerate(rnd.sample(Direction.get_all_cardinals() + [Direction.Still], rnd.choice([1, 2]))):
+            if rnd.random() < 0.15:
+                continue
+            if direction == Direction.Still:
+                cell = (x, y)
+            elif rnd.random() < 0.05:
+                # A structure any number of ships may end on
+                cell = None
+            else:
+                cell = (x + direction[0], y + direction[1])
+            options.append((direction, cell, rank))
+        if Direction.Still not in [option[0] for option in options]:
+            options.append((Direction.Still, (x, y), 2))
+        candidates.append(options)
+    return candidates, cells
+
+
+def test_resolved_moves_are_collision_free_and_rank_optimal():
+    rnd = random.Random(0)
+    for _ in range(1500):
+        candidates, cells = random_candidates(rnd, rnd.randint(2, 6))
+        choices = resolve(candidates, cells)
+        assert collision_free(candidates, choices)
+        best = min(total_rank(candidates, option) for option in itertools.product(*[range(len(options)) for options in candidates])
+                   if collision_free(candidates, option))
+        assert total_rank(candidates, choices) == best
+
+
+def test_cycle_of_three_rotates():
+    # Round a map three cells wide, the last ship moves onto the first one's cell
+    cells = [(0, 0), (1, 0), (2, 0)]
+    candidates = [[(Direction.East, (1, 0), 0), (Direction.Still, (0, 0), 2)],
+                  [(Direction.East, (2, 0), 0), (Direction.Still, (1, 0), 2)],
+                  [(Direction.East, (0, 0), 0), (Direction.Still, (2, 0), 2)]]
+    # Settled by following the first choices alone, before any assignment
+    assert MoveResolver._follow_first_choices(candidates, cells) == [0, 0, 0]
+    assert resolve(candidates, cells) == [0, 0, 0]
+
+
+def test_chain_follows_its_head():
+    cells = [(0, 0), (1, 0), (2, 0)]
+    candidates = [[(Direction.East, (1, 0), 0), (Direction.Still, (0, 0), 2)],
+                  [(Direction.East, (2, 0), 0), (Direction.Still, (1, 0), 2)],
+                  [(Direction.East, (3, 0), 0), (Direction.Still, (2, 0), 2)]]
+    # Settled by following the first choices alone, before any assignment
+    assert MoveResolver._follow_first_choices(candidates, cells) == [0, 0, 0]
+    assert resolve(candidates, cells) == [0, 0, 0]
+
+
+def test_chain_behind_a_ship_that_stays_holds_still():
+    cells = [(0, 0), (1, 0), (2, 0)]
+    candidates = [[(Direction.East, (1, 0), 0), (Direction.Still, (0, 0), 2)],
+                  [(Direction.East, (2, 0), 0), (Direction.Still, (1, 0), 2)],
+                  [(Direction.Still, (2, 0), 0)]]
+    assert resolve(candidates, cells) == [1, 1, 0]
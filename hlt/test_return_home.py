@@ -0,0 +1,46 @@
+import numpy as np
+
+from hlt import constants
+
+constants.load_constants({
+    'NEW_ENTITY_ENERGY_COST': 1000, 'DROPOFF_COST': 4000, 'MAX_ENERGY': 1000, 'MAX_TURNS': 400,
+    'EXTRACT_RATIO': 4, 'MOVE_COST_RATIO': 10, 'INSPIRATION_ENABLED': True, 'INSPIRATION_RADIUS': 4,
+    'INSPIRATION_SHIP_COUNT': 2, 'INSPIRED_EXTRACT_RATIO': 4, 'INSPIRED_BONUS_MULTIPLIER': 2.0,
+    'INSPIRED_MOVE_COST_RATIO': 10})
+
+from hlt.entity import Ship, Shipyard
+from hlt.game_map import GameMap, Player
+from hlt.positionals import Direction, Position
+
+
+def make_map(ships):
+    """
+    :param ships: A list of (owner, x, y) of the ships on an empty 16 x 16 map, player 0's shipyard is at (5, 5)
+    :return: The game map with its return costs for player 0, and player 0's ships
+    """
+    game_map = GameMap(np.zeros((16, 16), dtype=np.int64), 16, 16)
+    me = Player(0, Shipyard(0, -1, Position(5, 5)))
+    my_ships = []
+    for ship_id, (owner, x, y) in enumerate(ships):
+        ship = Ship(owner, ship_id, Position(x, y), 900)
+        game_map[ship.position].mark_unsafe(ship)
+        if owner == me.id:
+            my_ships.append(ship)
+    game_map.update_return_costs(me)
+    return game_map, my_ships
+
+
+def test_returning_ship_goes_straight_home():
+    game_map, (ship,) = make_map([(0, 5, 8)])
+    assert ship.best_moves_home(game_map) == Direction.North
+
+
+def test_returning_ship_steps_around_an_enemy():
+    game_map, (ship,) = make_map([(0, 5, 8), (1, 5, 7)])
+    best_moves = ship.best_moves_home(game_map)
+    assert sorted(best_moves) == sorted([Direction.East, Direction.West])
+
+
+def test_returning_ship_on_its_structure_stays():
+    game_map, (ship,) = make_map([(0, 5, 5)])
+    assert ship.best_moves_home(game_map) == Direction.Still